@@ -0,0 +1,80 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Harness benchmarks, not collected by default as files are not test_*.py."
+
+import time
+
+import pytest
+
+from . import synthetic
+
+
+def _walk(module):
+  "Reads every resource value in a plan module and its children."
+  count = 0
+  for resource in module.get('resources', []):
+    count += len(resource['values'])
+  for child in module.get('child_modules', []):
+    count += _walk(child)
+  return count
+
+
+@pytest.mark.parametrize('name', synthetic.FIXTURES)
+def test_plan_runner(plan_runner, synthetic_fixtures, benchmark_record, name):
+  "Plan runner, walking the full plan."
+  fixture_path = synthetic_fixtures(name)
+  start = time.perf_counter()
+  plan, _ = plan_runner(fixture_path)
+  benchmark_record('total', time.perf_counter() - start)
+  start = time.perf_counter()
+  assert _walk(plan.root_module)
+  benchmark_record('walk', time.perf_counter() - start)
+
+
+@pytest.mark.parametrize('name', synthetic.FIXTURES)
+def test_e2e_plan_runner(e2e_plan_runner, synthetic_fixtures,
+                         benchmark_record, name):
+  "End-to-end runner, reading every resource value."
+  fixture_path = synthetic_fixtures(name)
+  start = time.perf_counter()
+  _, resources = e2e_plan_runner(fixture_path)
+  benchmark_record('total', time.perf_counter() - start)
+  start = time.perf_counter()
+  assert sum(len(r['values']) for r in resources)
+  benchmark_record('walk', time.perf_counter() - start)
+
+
+@pytest.mark.parametrize('name', synthetic.FIXTURES)
+def test_fast_e2e_plan_runner(fast_e2e_plan_runner, synthetic_fixtures,
+                              benchmark_record, name):
+  "Fast end-to-end runner loading values, then reading every resource value."
+  fixture_path = synthetic_fixtures(name)
+  start = time.perf_counter()
+  _, resources = fast_e2e_plan_runner(fixture_path, compute_sums=False)
+  benchmark_record('total', time.perf_counter() - start)
+  start = time.perf_counter()
+  assert sum(len(r['values']) for r in resources)
+  benchmark_record('walk', time.perf_counter() - start)
+
+
+@pytest.mark.parametrize('name', synthetic.FIXTURES)
+def test_fast_e2e_plan_runner_sums(fast_e2e_plan_runner, synthetic_fixtures,
+                                   benchmark_record, name):
+  "Fast end-to-end runner, only computing counts without loading values."
+  fixture_path = synthetic_fixtures(name)
+  start = time.perf_counter()
+  _, num_resources, _ = fast_e2e_plan_runner(fixture_path)
+  benchmark_record('total', time.perf_counter() - start)
+  assert num_resources
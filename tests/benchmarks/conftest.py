@@ -0,0 +1,56 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Fixtures for the harness benchmarks, run via tests.benchmarks.run."
+
+import json
+import os
+
+import pytest
+
+from ..fast.conftest import fast_e2e_plan_runner  # noqa: F401
+from . import synthetic
+
+OUTPUT = os.environ.get('TFTEST_BENCHMARK_OUTPUT')
+RESULTS = {}
+
+
+@pytest.fixture(scope='session')
+def synthetic_fixtures(tmp_path_factory):
+  "Returns a function writing a synthetic fixture once, returns its path."
+  base = tmp_path_factory.mktemp('synthetic')
+  paths = {}
+
+  def get(name):
+    if name not in paths:
+      paths[name] = synthetic.write_fixture(str(base), name)
+    return paths[name]
+
+  return get
+
+
+@pytest.fixture
+def benchmark_record(request):
+  "Returns a function recording a measurement for the current test."
+
+  def record(metric, elapsed):
+    RESULTS.setdefault(request.node.nodeid, {})[metric] = elapsed
+
+  return record
+
+
+def pytest_sessionfinish(session):
+  if OUTPUT and not hasattr(session.config, 'workerinput'):
+    with open(OUTPUT, 'w') as f:
+      json.dump(RESULTS, f)
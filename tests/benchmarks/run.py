@@ -0,0 +1,136 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the test harness on synthetic fixtures.
+
+Run from the repository root, e.g.
+
+  python -m tests.benchmarks.run --save baseline.json
+  python -m tests.benchmarks.run --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+BENCHMARKS = os.path.join('tests', 'benchmarks', 'bench_harness.py')
+DOC_EXAMPLES = os.path.join('tests', 'doc_examples')
+COLUMNS = ('init', 'plan', 'show', 'parse', 'harness', 'walk', 'total')
+# differences below this many seconds are never reported as regressions
+MIN_DELTA = 0.05
+
+
+def _pytest(args, env=None):
+  'Run pytest in a subprocess from the repository root, return wall time.'
+  start = time.perf_counter()
+  subprocess.run([sys.executable, '-m', 'pytest'] + args, cwd=BASEDIR,
+                 env=env, check=True, stdout=subprocess.DEVNULL)
+  return time.perf_counter() - start
+
+
+def run_runners(pytest_args):
+  'Run runner benchmarks and return a row of measurements per test.'
+  with tempfile.TemporaryDirectory() as tmp_path:
+    output = os.path.join(tmp_path, 'results.json')
+    timings = os.path.join(tmp_path, 'timings.json')
+    env = dict(os.environ, TFTEST_BENCHMARK_OUTPUT=output)
+    # plans are shared within the session, so Terraform phases are only
+    # recorded by the first benchmark of each fixture
+    _pytest(['-q', '--no-plan-cache', '--plan-timings', timings, BENCHMARKS] +
+            pytest_args, env)
+    with open(output) as f:
+      results = json.load(f)
+    with open(timings) as f:
+      phases = json.load(f)['tests']
+  rows = {}
+  for nodeid, measures in results.items():
+    test_phases = phases.get(nodeid, {})
+    row = {p: test_phases.get(p, 0.0) for p in COLUMNS[:4]}
+    # time spent in the runner outside of Terraform and JSON decoding
+    row['harness'] = max(0.0, measures['total'] - sum(row.values()))
+    row['walk'] = measures.get('walk', 0.0)
+    row['total'] = measures['total'] + row['walk']
+    rows[nodeid.split('::', 1)[1]] = row
+  return rows
+
+
+def run_collection():
+  'Return doc example collection times without and with the pytest cache.'
+  args = ['-q', '--collect-only', DOC_EXAMPLES]
+  cold = _pytest(args + ['-p', 'no:cacheprovider'])
+  _pytest(args)
+  warm = _pytest(args)
+  return {
+      'collect_doc_examples[cold]': {'total': cold},
+      'collect_doc_examples[warm]': {'total': warm},
+  }
+
+
+def regressions(rows, baseline, tolerance):
+  'Return names of rows whose total exceeds the baseline by tolerance.'
+  result = []
+  for name, row in rows.items():
+    if name not in baseline:
+      continue
+    previous = baseline[name]['total']
+    if row['total'] - previous > max(MIN_DELTA, previous * tolerance):
+      result.append(name)
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--save', metavar='PATH',
+                      help='write results to a JSON file')
+  parser.add_argument('--baseline', metavar='PATH',
+                      help='compare results with a file written by --save')
+  parser.add_argument('--tolerance', type=float, default=0.25,
+                      help='slowdown relative to baseline reported as error')
+  parser.add_argument('-k', dest='keyword',
+                      help='only run benchmarks matching this expression')
+  args = parser.parse_args()
+
+  rows = run_runners(['-k', args.keyword] if args.keyword else [])
+  rows.update(run_collection())
+
+  baseline = {}
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+  width = max(len(name) for name in rows)
+  print(f'{"benchmark":<{width}}' + ''.join(f'{c:>9}' for c in COLUMNS) +
+        ('  baseline' if baseline else ''))
+  for name, row in rows.items():
+    line = f'{name:<{width}}' + ''.join(
+        f'{row[c]:8.3f}s' if c in row else f'{"":>9}' for c in COLUMNS)
+    if name in baseline:
+      line += f'  {row["total"] / max(baseline[name]["total"], 1e-6):7.2f}x'
+    print(line)
+
+  if args.save:
+    with open(args.save, 'w') as f:
+      json.dump(rows, f, indent=2, sort_keys=True)
+  slower = regressions(rows, baseline, args.tolerance)
+  if slower:
+    print(f'slower than baseline: {", ".join(slower)}', file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
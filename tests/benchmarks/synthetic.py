@@ -0,0 +1,85 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Synthetic fixtures of a given size for benchmarking the test harness."
+
+import os
+
+# name: (resources per module, module nesting depth)
+FIXTURES = {
+    'flat_10': (10, 1),
+    'flat_100': (100, 1),
+    'flat_1000': (1000, 1),
+    'deep_10x10': (10, 10),
+}
+
+VERSIONS = '''terraform {
+  required_providers {
+    null = {
+      source = "hashicorp/null"
+    }
+  }
+}
+'''
+
+RESOURCES = '''resource "null_resource" "default" {
+  for_each = toset([for i in range(%d) : tostring(i)])
+  triggers = {
+    index = each.key
+    name  = "${var.prefix}-${each.key}"
+    tags  = jsonencode({ level = %d, index = each.key })
+  }
+}
+'''
+
+VARIABLES = '''variable "prefix" {
+  type    = string
+  default = "bench"
+}
+'''
+
+
+def _write(path, name, content):
+  with open(os.path.join(path, name), 'w') as f:
+    f.write(content)
+
+
+def _write_module(path, resources, level, depth):
+  'Write a module with resources, calling a nested one until depth.'
+  os.makedirs(path)
+  body = RESOURCES % (resources, level)
+  if level < depth:
+    body += ('\nmodule "child" {\n  source = "./child"\n'
+             '  prefix = "${var.prefix}-%d"\n}\n' % level)
+    _write_module(os.path.join(path, 'child'), resources, level + 1, depth)
+  _write(path, 'main.tf', body)
+  _write(path, 'variables.tf', VARIABLES)
+  _write(path, 'versions.tf', VERSIONS)
+
+
+def write_fixture(path, name):
+  'Write the fixture and module for a synthetic fixture name under path.'
+  resources, depth = FIXTURES[name]
+  base = os.path.join(path, name)
+  # the module under test holds no resources, like most modules in the
+  # examples and FAST stages it only calls other modules
+  _write_module(os.path.join(base, 'module', 'part'), resources, 1, depth)
+  os.makedirs(os.path.join(base, 'fixture'))
+  _write(os.path.join(base, 'module'), 'main.tf',
+         'module "part" {\n  source = "./part"\n  prefix = var.prefix\n}\n')
+  _write(os.path.join(base, 'module'), 'variables.tf', VARIABLES)
+  _write(os.path.join(base, 'fixture'), 'main.tf',
+         'module "test" {\n  source = "../module"\n  prefix = var.prefix\n}\n')
+  _write(os.path.join(base, 'fixture'), 'variables.tf', VARIABLES)
+  return os.path.join(base, 'fixture')
@@ -0,0 +1,78 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare startup time of tools run as scripts or via `python -m tools`.
+
+Run from the repository root, e.g.
+
+  python -m tests.benchmarks.tools_startup --runs 10 --modules 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+# tools with a --help option
+TOOLS = ('check_documentation', 'check_links', 'check_names', 'state_iam',
+         'tfdoc', 'validate_schema')
+
+
+def _time(args):
+  'Run a Python command from the repository root, return its wall time.'
+  start = time.perf_counter()
+  subprocess.run([sys.executable] + args, cwd=BASEDIR, check=True,
+                 stdout=subprocess.DEVNULL)
+  return time.perf_counter() - start
+
+
+def _median(args, runs):
+  'Return the median wall time of runs of a Python command.'
+  return statistics.median(_time(args) for _ in range(runs))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--runs', type=int, default=5,
+                      help='runs of each command, the median is reported')
+  parser.add_argument('--modules', type=int, default=10,
+                      help='modules documented in the batch benchmark')
+  args = parser.parse_args()
+
+  print(f'{"command":<24}{"script":>10}{"-m tools":>10}')
+  for tool in TOOLS:
+    script = _median([os.path.join('tools', f'{tool}.py'), '--help'],
+                     args.runs)
+    dispatched = _median(['-m', 'tools', tool, '--help'], args.runs)
+    print(f'{tool + " --help":<24}{script:9.3f}s{dispatched:9.3f}s')
+
+  # hooks run tools once per changed file, --each runs them in one process
+  modules = sorted(
+      os.path.join('modules', m)
+      for m in os.listdir(os.path.join(BASEDIR, 'modules'))
+      if os.path.exists(os.path.join(BASEDIR, 'modules', m, 'README.md')))
+  modules = modules[:args.modules]
+  script = sum(
+      _time([os.path.join('tools', 'tfdoc.py'), '--no-replace', m])
+      for m in modules)
+  dispatched = _time(['-m', 'tools', '--each', 'tfdoc', '--no-replace', '--'] +
+                     modules)
+  print(f'{f"tfdoc x{len(modules)}":<24}{script:9.3f}s{dispatched:9.3f}s')
+
+
+if __name__ == '__main__':
+  main()
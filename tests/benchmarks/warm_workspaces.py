@@ -0,0 +1,99 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare plans in fresh working directories with reused ones.
+
+Run from the repository root, e.g.
+
+  python -m tests.benchmarks.warm_workspaces tests/modules/project/fixture \\
+    --runs 5 --var prefix=foo --var prefix=bar
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from ..harness import workspace
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+TERRAFORM = os.environ.get('TERRAFORM', 'terraform')
+
+
+def cold_plan(init_cache, fixture_path, tf_vars):
+  'Plan in a new working directory passing variables via -var.'
+  with tempfile.TemporaryDirectory(
+      prefix=os.path.basename(fixture_path) + '_',
+      dir=os.path.dirname(fixture_path)) as tfdir:
+    workspace.overlay(fixture_path, tfdir)
+    init_cache.link(fixture_path, tfdir)
+    tf = init_cache.terraform(tfdir, fixture_path)
+    tf.plan_json(tf_vars=tf_vars)
+
+
+def warm_plan(workspaces, fixture_path, tf_vars):
+  'Plan in a reused working directory passing variables via a file.'
+  with workspaces.checkout(fixture_path) as tfdir:
+    var_file = workspaces.var_file(fixture_path, tfdir, tf_vars)
+    tf = workspaces.init_cache.terraform(tfdir, fixture_path)
+    tf.plan_json(tf_var_file=var_file)
+
+
+def measure(fn, runs, variants):
+  'Return the elapsed time of each plan, cycling through variants.'
+  result = []
+  for i in range(runs):
+    start = time.perf_counter()
+    fn(variants[i % len(variants)])
+    result.append(time.perf_counter() - start)
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('fixture', help='fixture folder to plan')
+  parser.add_argument('--runs', type=int, default=5,
+                      help='plans run for each mode')
+  parser.add_argument('--var', action='append', default=[],
+                      metavar='NAME=VALUE',
+                      help='one variable set per use, cycled across runs')
+  args = parser.parse_args()
+
+  fixture_path = os.path.abspath(args.fixture)
+  variants = [dict([v.split('=', 1)]) for v in args.var] or [{}]
+  init_cache = workspace.InitCache(BASEDIR, TERRAFORM,
+                                   os.environ.get('TF_PLUGIN_CACHE_DIR'))
+  workspaces = workspace.WarmWorkspaces(init_cache)
+  try:
+    # initialize once outside of the measured runs, as both modes share it
+    init_cache.prepare(fixture_path)
+    results = {
+        'cold': measure(lambda v: cold_plan(init_cache, fixture_path, v),
+                        args.runs, variants),
+        'warm': measure(lambda v: warm_plan(workspaces, fixture_path, v),
+                        args.runs, variants),
+    }
+  finally:
+    workspaces.cleanup()
+    init_cache.cleanup()
+
+  print(f'{"mode":<6} {"runs":>5} {"mean":>8} {"median":>8} {"min":>8}')
+  for mode, times in results.items():
+    print(f'{mode:<6} {len(times):>5} {statistics.mean(times):>7.2f}s '
+          f'{statistics.median(times):>7.2f}s {min(times):>7.2f}s')
+
+
+if __name__ == '__main__':
+  main()
@@ -15,19 +15,220 @@
 "Shared fixtures"
 
 import inspect
+import json
 import os
 import shutil
+import subprocess
 import tempfile
 
 import pytest
-import tftest
+
+from .harness import batch
+from .harness import cache
+from .harness import frozen
+from .harness import impact
+from .harness import index
+from .harness import pool
+from .harness import stream
+from .harness import timing
+from .harness import workspace
 
 BASEDIR = os.path.dirname(os.path.dirname(__file__))
+TERRAFORM = os.environ.get('TERRAFORM', 'terraform')
+# environment for offline runs: no version checks, and placeholder
+# credentials for the google provider which never uses them without refresh
+OFFLINE_ENV = {
+    'CHECKPOINT_DISABLE': '1',
+    'GOOGLE_OAUTH_ACCESS_TOKEN': 'offline',
+}
+
+
+def pytest_addoption(parser):
+  parser.addoption('--no-plan-cache', action='store_true', default=False,
+                   help='Always run Terraform plan, ignoring cached plans.')
+  parser.addoption('--plan-cache-dir', default=None,
+                   help='Directory for cached plans, defaults to pytest cache.')
+  parser.addoption('--terraform-jobs', type=int,
+                   default=os.environ.get('TFTEST_JOBS'),
+                   help='Maximum concurrent Terraform runs across workers.')
+  parser.addoption('--provider-mirror',
+                   default=os.environ.get('TFTEST_PROVIDER_MIRROR'),
+                   help='Local provider mirror used instead of the registry.')
+  parser.addoption('--offline', action='store_true',
+                   default=bool(os.environ.get('TFTEST_OFFLINE')),
+                   help='Plan without refresh using only local providers.')
+  parser.addoption('--batch-doc-examples', action='store_true', default=False,
+                   help='Plan all documentation examples of a module at once.')
+  parser.addoption('--changed-since', default=os.environ.get(
+      'TFTEST_CHANGED_SINCE'), metavar='REF',
+                   help='Only run tests affected by changes since git REF.')
+  parser.addoption('--committed-only', action='store_true',
+                   default=bool(os.environ.get('TFTEST_COMMITTED_ONLY')),
+                   help='Ignore uncommitted changes with --changed-since.')
+  parser.addoption('--plan-timings', default=None, metavar='PATH',
+                   help='Write Terraform phase timings to a JSON file.')
+  parser.addoption('--plan-timings-top', type=int, default=10,
+                   help='Number of slowest fixtures shown in the summary.')
+
+
+def _plugin_dirs(config):
+  "Returns the provider cache folder, and the folder init installs from."
+  plugin_cache_dir = os.environ.get('TF_PLUGIN_CACHE_DIR')
+  # the cache plugin can be disabled via -p no:cacheprovider
+  config_cache = getattr(config, 'cache', None)
+  if plugin_cache_dir is None and config_cache is not None:
+    plugin_cache_dir = str(config_cache.mkdir('tftest-plugins'))
+  plugin_dir = config.getoption('provider_mirror')
+  if config.getoption('offline'):
+    # providers downloaded by previous runs are laid out as a local mirror
+    plugin_dir = plugin_dir or plugin_cache_dir
+  return plugin_cache_dir, plugin_dir
+
+
+def pytest_configure(config):
+  if config.getoption('offline'):
+    _, plugin_dir = _plugin_dirs(config)
+    if not plugin_dir:
+      raise pytest.UsageError(
+          '--offline needs --provider-mirror or a provider cache.')
+    if not (os.path.isdir(plugin_dir) and os.listdir(plugin_dir)):
+      raise pytest.UsageError(
+          f'--offline found no providers in {plugin_dir}, populate it via '
+          'terraform providers mirror or a run with network access.')
+  config.addinivalue_line(
+      'markers', f'{impact.MARKER}(*paths): modules used by the test, in '
+      'addition to the fixtures in its folder')
+  ref = config.getoption('changed_since')
+  if ref:
+    try:
+      config.pluginmanager.register(
+          impact.ImpactPlugin(BASEDIR, ref,
+                              config.getoption('committed_only')),
+          'tftest-impact')
+    except (OSError, subprocess.CalledProcessError) as e:
+      raise pytest.UsageError(f'cannot list changes since {ref}: {e}')
+  # the controller process creates a folder shared with all xdist workers,
+  # which inherit its location and the pool size via the environment
+  if not hasattr(config, 'workerinput'):
+    size = config.getoption('terraform_jobs') or pool.default_size()
+    os.environ['TFTEST_SESSION_DIR'] = tempfile.mkdtemp(prefix='tftest-')
+    os.environ['TFTEST_POOL_SIZE'] = str(size)
+    config._tftest_session_dir = os.environ['TFTEST_SESSION_DIR']
+  config.pluginmanager.register(
+      timing.TimingPlugin(config, os.environ['TFTEST_SESSION_DIR']),
+      'tftest-timing')
+
+
+def pytest_unconfigure(config):
+  path = getattr(config, '_tftest_session_dir', None)
+  if path:
+    shutil.rmtree(path, ignore_errors=True)
+    del os.environ['TFTEST_SESSION_DIR']
+
+
+def pytest_terminal_summary(terminalreporter, config):
+  stats = pool.summarize(
+      os.path.join(os.environ['TFTEST_SESSION_DIR'], 'pool'))
+  if not stats:
+    return
+  terminalreporter.write_sep('-', 'terraform pool')
+  terminalreporter.write_line(
+      'size {} runs {runs} queue depth mean {depth_mean:.1f} max {depth_max} '
+      'wait total {wait_total:.1f}s mean {wait_mean:.2f}s max {wait_max:.2f}s'.
+      format(os.environ['TFTEST_POOL_SIZE'], **stats))
+
+
+def _fixture(fixture_path):
+  "Returns the fixture path relative to the repository root."
+  return os.path.relpath(fixture_path, BASEDIR)
+
+
+def _vars_key(tf_vars):
+  "Returns a hashable key for a dict of Terraform variables."
+  return tuple(sorted((k, str(v)) for k, v in tf_vars.items()))
+
+
+@pytest.fixture(scope='session')
+def plan_cache(pytestconfig):
+  "Returns the on-disk plan cache, scoped to the session if disabled."
+  path = pytestconfig.getoption('plan_cache_dir')
+  config_cache = getattr(pytestconfig, 'cache', None)
+  if path is None:
+    if pytestconfig.getoption('no_plan_cache') or config_cache is None:
+      path = os.path.join(os.environ['TFTEST_SESSION_DIR'], 'plans')
+    else:
+      path = config_cache.mkdir('tftest-plans')
+  plan_cache = cache.PlanCache(path, BASEDIR, TERRAFORM)
+  yield plan_cache
+  plan_cache.prune()
+
+
+@pytest.fixture(scope='session')
+def terraform_pool():
+  "Returns the pool limiting concurrent Terraform runs across workers."
+  terraform_pool = pool.Pool(
+      os.path.join(os.environ['TFTEST_SESSION_DIR'], 'pool'),
+      os.environ['TFTEST_POOL_SIZE'],
+      os.environ.get('PYTEST_XDIST_WORKER', 'main'))
+  yield terraform_pool
+  terraform_pool.dump()
 
 
 @pytest.fixture(scope='session')
-def _plan_runner():
+def terraform_timings(pytestconfig):
+  "Returns the per-test and per-fixture Terraform timings."
+  return pytestconfig.pluginmanager.get_plugin('tftest-timing').timings
+
+
+@pytest.fixture(scope='session')
+def terraform_init(pytestconfig, terraform_pool, terraform_timings):
+  "Returns the session cache of initialized fixtures."
+  plugin_cache_dir, plugin_dir = _plugin_dirs(pytestconfig)
+  env = OFFLINE_ENV if pytestconfig.getoption('offline') else None
+  init = workspace.InitCache(BASEDIR, TERRAFORM, plugin_cache_dir, plugin_dir,
+                             terraform_pool, terraform_timings, env)
+  yield init
+  init.cleanup()
+
+
+@pytest.fixture(scope='session')
+def provider_versions(terraform_init):
+  "Returns a digest of the provider versions selected by init this session."
+  # fixtures do not lock providers and share the requirements of
+  # default-versions.tf, so a single root using them is initialized once
+  # for all workers instead of initializing each fixture
+  session_dir = os.environ['TFTEST_SESSION_DIR']
+  path = os.path.join(session_dir, 'providers')
+  with pool.file_lock(path + '.lock'):
+    if not os.path.exists(path):
+      probe_path = tempfile.mkdtemp(prefix='probe-', dir=session_dir)
+      shutil.copy(os.path.join(BASEDIR, 'default-versions.tf'),
+                  os.path.join(probe_path, 'versions.tf'))
+      digest = terraform_init.providers(probe_path)
+      with open(path, 'w') as f:
+        f.write(digest)
+  with open(path) as f:
+    return f.read()
+
+
+@pytest.fixture(scope='session')
+def terraform_workspaces(terraform_init):
+  "Returns the working directories reused across plans of each fixture."
+  workspaces = workspace.WarmWorkspaces(terraform_init)
+  yield workspaces
+  workspaces.cleanup()
+
+
+@pytest.fixture(scope='session')
+def _plan_runner(pytestconfig, plan_cache, provider_versions, terraform_init,
+                 terraform_pool, terraform_timings, terraform_workspaces):
   "Returns a function to run Terraform plan on a fixture."
+  # plans are shared between tests calling the runner with the same
+  # arguments, and returned as read-only views so tests cannot alter them
+  offline = pytestconfig.getoption('offline')
+  plans = {}
+  root_modules = {}
+  batches = {}
 
   def run_plan(fixture_path=None, targets=None, refresh=True, **tf_vars):
     "Runs Terraform plan and returns parsed output."
@@ -36,18 +237,100 @@ def _plan_runner():
       caller = inspect.stack()[2]
       fixture_path = os.path.join(os.path.dirname(caller.filename), "fixture")
 
+    refresh = refresh and not offline
+    memo_key = (os.path.abspath(fixture_path), tuple(sorted(targets or [])),
+                refresh, _vars_key(tf_vars))
+    if memo_key not in plans:
+      path = _plan_path(fixture_path, targets, refresh, tf_vars)
+      with terraform_timings.phase('parse', _fixture(fixture_path)):
+        with open(path) as f:
+          plans[memo_key] = frozen.PlanOutput(json.load(f))
+    return plans[memo_key]
+
+  def run_root_module(fixture_path=None, targets=None, refresh=True,
+                      values=True, **tf_vars):
+    "Runs Terraform plan and returns the root module streamed from its JSON."
+    if fixture_path is None:
+      # find out the fixture directory from the caller's directory
+      caller = inspect.stack()[2]
+      fixture_path = os.path.join(os.path.dirname(caller.filename), "fixture")
+
+    refresh = refresh and not offline
+    memo_key = (os.path.abspath(fixture_path), tuple(sorted(targets or [])),
+                refresh, _vars_key(tf_vars), values)
+    if memo_key not in root_modules:
+      path = _plan_path(fixture_path, targets, refresh, tf_vars)
+      with terraform_timings.phase('parse', _fixture(fixture_path)):
+        root_modules[memo_key] = stream.load_root_module(path, values)
+    return root_modules[memo_key]
+
+  def _plan_path(fixture_path, targets, refresh, tf_vars):
+    "Runs Terraform plan unless cached, and returns the path to its JSON."
+    fixture = _fixture(fixture_path)
+    with terraform_timings.phase('cache', fixture):
+      key = plan_cache.key(fixture_path, targets, refresh, tf_vars,
+                           providers=provider_versions)
+      path = plan_cache.lookup(key)
+    if path is not None:
+      return path
+
+    # successive plans of the fixture reuse linked working directories, and
+    # only swap the file passing variables
+    with terraform_workspaces.checkout(fixture_path) as tfdir:
+      var_file = terraform_workspaces.var_file(fixture_path, tfdir, tf_vars)
+      tf = terraform_init.terraform(tfdir, fixture_path)
+      with terraform_pool.slot():
+        plan = tf.plan_json(refresh=refresh, targets=targets,
+                            tf_var_file=var_file)
+    return plan_cache.store(key, plan)
+
+  def run_many(variants, fixture_path=None, targets=None, refresh=True):
+    "Runs a single Terraform plan for a list of tf_vars, returns plans."
+    if fixture_path is None:
+      # find out the fixture directory from the caller's directory
+      caller = inspect.stack()[2]
+      fixture_path = os.path.join(os.path.dirname(caller.filename), "fixture")
+
+    refresh = refresh and not offline
+    memo_key = (os.path.abspath(fixture_path), tuple(sorted(targets or [])),
+                refresh, tuple(_vars_key(v) for v in variants))
+    if memo_key not in batches:
+      path = _many_path(fixture_path, targets, refresh, variants)
+      with terraform_timings.phase('parse', _fixture(fixture_path)):
+        with open(path) as f:
+          raw = json.load(f)
+      batches[memo_key] = [
+          batch.VariantPlanOutput(r)
+          for r in batch.split_plan(raw, len(variants))
+      ]
+    return batches[memo_key]
+
+  def _many_path(fixture_path, targets, refresh, variants):
+    "Runs Terraform plan on a root module calling fixture once per variant."
+    fixture = _fixture(fixture_path)
+    with terraform_timings.phase('cache', fixture):
+      key = plan_cache.key(fixture_path, targets, refresh, variants=variants,
+                           providers=provider_versions)
+      path = plan_cache.lookup(key)
+    if path is not None:
+      return path
+
     fixture_parent = os.path.dirname(fixture_path)
-    fixture_prefix = os.path.basename(fixture_path) + "_"
+    fixture_prefix = os.path.basename(fixture_path) + "_many_"
     with tempfile.TemporaryDirectory(prefix=fixture_prefix,
                                      dir=fixture_parent) as tmp_path:
-      # copy fixture to a temporary directory so we can execute
-      # multiple tests in parallel
-      shutil.copytree(fixture_path, tmp_path, dirs_exist_ok=True)
-      tf = tftest.TerraformTest(tmp_path, BASEDIR,
-                                os.environ.get('TERRAFORM', 'terraform'))
-      tf.setup(upgrade=True)
-      return tf.plan(output=True, refresh=refresh, tf_vars=tf_vars, targets=targets)
+      batch.render_root(fixture_path, tmp_path, variants)
+      tf = terraform_init.terraform(tmp_path, fixture_path)
+      terraform_init.init(tf)
+      with terraform_pool.slot():
+        plan = tf.plan_json(refresh=refresh, targets=[
+            t for i in range(len(variants))
+            for t in batch.variant_targets(targets, i) or []
+        ])
+    return plan_cache.store(key, plan)
 
+  run_plan.root_module = run_root_module
+  run_plan.many = run_many
   return run_plan
 
 
@@ -60,58 +343,85 @@ def plan_runner(_plan_runner):
     plan = _plan_runner(fixture_path, targets=targets, **tf_vars)
     # skip the fixture
     root_module = plan.root_module['child_modules'][0]
-    return plan, root_module['resources']
+    return plan, index.PlanIndex(root_module['resources'])
+
+  def run_many(variants, fixture_path=None, targets=None):
+    "Runs one Terraform plan for a list of tf_vars, returns plans and resources."
+    result = []
+    for plan in _plan_runner.many(variants, fixture_path, targets=targets):
+      # skip the fixture
+      root_module = plan.root_module['child_modules'][0]
+      result.append((plan, index.PlanIndex(root_module['resources'])))
+    return result
 
+  run_plan.many = run_many
   return run_plan
 
 
 @ pytest.fixture(scope='session')
 def e2e_plan_runner(_plan_runner):
   "Returns a function to run Terraform plan on an end-to-end fixture."
+  # indexes are built once per plan, as root modules are memoized
+  results = {}
 
   def run_plan(fixture_path=None, targets=None, refresh=True,
                include_bare_resources=False, **tf_vars):
     "Runs Terraform plan on an end-to-end module using defaults, returns data."
-    plan = _plan_runner(fixture_path, targets=targets,
-                        refresh=refresh, **tf_vars)
-    # skip the fixture
-    root_module = plan.root_module['child_modules'][0]
-    modules = dict((mod['address'], mod['resources'])
-                   for mod in root_module['child_modules'])
-    resources = [r for m in modules.values() for r in m]
-    if include_bare_resources:
-      bare_resources = root_module['resources']
-      resources.extend(bare_resources)
-    return modules, resources
+    root_module = _plan_runner.root_module(fixture_path, targets=targets,
+                                           refresh=refresh, **tf_vars)
+    key = (id(root_module), include_bare_resources)
+    if key not in results:
+      # skip the fixture
+      root_module = root_module['child_modules'][0]
+      modules = frozen.FrozenDict(
+          (mod['address'], index.PlanIndex(mod['resources']))
+          for mod in root_module['child_modules'])
+      resources = [r for m in modules.values() for r in m]
+      if include_bare_resources:
+        bare_resources = root_module['resources']
+        resources.extend(bare_resources)
+      results[key] = modules, index.PlanIndex(resources)
+    return results[key]
 
   return run_plan
 
 
 @ pytest.fixture(scope='session')
-def doc_example_plan_runner(_plan_runner):
+def doc_example_plan_runner(pytestconfig, terraform_init, terraform_pool):
   "Returns a function to run Terraform plan on documentation examples."
+  refresh = not pytestconfig.getoption('offline')
+
+  def _plan(fixture_path):
+    "Runs Terraform init and plan on fixture, returns the parsed plan."
+    tf = terraform_init.terraform(fixture_path)
+    terraform_init.init(tf)
+    with terraform_pool.slot():
+      return tf.plan(output=True, refresh=refresh)
 
   def run_plan(fixture_path=None):
     "Runs Terraform plan and returns count of modules and resources."
-    tf = tftest.TerraformTest(fixture_path, BASEDIR,
-                              os.environ.get('TERRAFORM', 'terraform'))
-    tf.setup(upgrade=True)
-    plan = tf.plan(output=True, refresh=True)
     # the fixture is the example we are testing
-    modules = plan.modules or {}
+    modules = _plan(fixture_path).modules or {}
     return (
         len(modules),
         sum(len(m.resources) for m in modules.values()))
 
+  def run_batch(fixture_path, count):
+    "Runs Terraform plan on a batch of examples, returns counts for each."
+    return batch.example_counts(_plan(fixture_path), count)
+
+  run_plan.batch = run_batch
   return run_plan
 
 
 @ pytest.fixture(scope='session')
-def apply_runner():
+def apply_runner(pytestconfig, terraform_init, terraform_pool):
   "Returns a function to run Terraform apply on a fixture."
 
   def run_apply(fixture_path=None, **tf_vars):
     "Runs Terraform plan and returns parsed output."
+    if pytestconfig.getoption('offline'):
+      pytest.skip('apply needs provider credentials, not run offline')
     if fixture_path is None:
       # find out the fixture directory from the caller's directory
       caller = inspect.stack()[1]
@@ -122,14 +432,14 @@ def apply_runner():
 
     with tempfile.TemporaryDirectory(prefix=fixture_prefix,
                                      dir=fixture_parent) as tmp_path:
-      # copy fixture to a temporary directory so we can execute
-      # multiple tests in parallel
-      shutil.copytree(fixture_path, tmp_path, dirs_exist_ok=True)
-      tf = tftest.TerraformTest(tmp_path, BASEDIR,
-                                os.environ.get('TERRAFORM', 'terraform'))
-      tf.setup(upgrade=True)
-      apply = tf.apply(tf_vars=tf_vars)
-      output = tf.output(json_format=True)
+      # link fixture into a temporary directory so we can execute
+      # multiple tests in parallel, and reuse the session's init for it
+      workspace.overlay(fixture_path, tmp_path)
+      terraform_init.link(fixture_path, tmp_path)
+      tf = terraform_init.terraform(tmp_path, fixture_path)
+      with terraform_pool.slot():
+        apply = tf.apply(tf_vars=tf_vars)
+        output = tf.output(json_format=True)
       return apply, output
 
   return run_apply
@@ -12,11 +12,80 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import threading
 from pathlib import Path
 
-import marko
+import pytest
 
-MODULES_PATH = Path(__file__).parents[2] / 'modules/'
+from ..harness import batch
+from ..harness import cache
+from ..harness import impact
+from ..harness import readme
+from ..harness import sources
+
+BASEDIR = Path(__file__).parents[2]
+MODULES_PATH = BASEDIR / 'modules/'
+VARIABLES_PATH = Path(__file__).parent / 'variables.tf'
+
+Example = collections.namedtuple('Example', 'code module batch')
+
+
+@pytest.fixture(scope='session')
+def example_cache(pytestconfig, plan_cache, provider_versions):
+  "Returns the cache of counts for planned examples, or None if disabled."
+  # the cache plugin can be disabled via -p no:cacheprovider
+  config_cache = getattr(pytestconfig, 'cache', None)
+  if pytestconfig.getoption('no_plan_cache') or config_cache is None:
+    return
+  return cache.ExampleCache(config_cache, str(BASEDIR),
+                            plan_cache.terraform_version, provider_versions,
+                            [VARIABLES_PATH])
+
+
+@pytest.fixture(scope='session')
+def doc_example_batches(pytestconfig, doc_example_plan_runner, example_cache,
+                        tmp_path_factory):
+  "Returns a function giving counts for an example from its module's batch."
+  enabled = pytestconfig.getoption('batch_doc_examples')
+  results = {}
+  lock = threading.Lock()
+
+  def run_batch(example):
+    "Plans all examples of the module once, returns None on failure."
+    if not enabled:
+      return
+    with lock:
+      if example.module not in results:
+        # examples with cached counts do not need to be planned again
+        examples = [
+            code for code in example.batch if example_cache is None or
+            example_cache.get(example_cache.key(code)) is None
+        ]
+        root_path = tmp_path_factory.mktemp(f'{example.module}_examples_')
+        batch.render_examples(str(root_path), examples, {
+            'modules': str(MODULES_PATH.resolve()),
+            'variables.tf': str(VARIABLES_PATH.resolve()),
+        })
+        try:
+          counts = doc_example_plan_runner.batch(str(root_path), len(examples))
+        except Exception:
+          # a broken example fails the whole plan, so each example of the
+          # module is planned on its own to report failures individually
+          counts = [None] * len(examples)
+        results[example.module] = dict(zip(examples, counts))
+    return results[example.module].get(example.code)
+
+  return run_batch
+
+
+def _example_sources(code):
+  "Returns the paths of local modules used by an example."
+  return [
+      str(BASEDIR / source)
+      for source in sources.MODULE_SOURCE_RE.findall(code)
+      if source.startswith('./')
+  ]
 
 
 def pytest_generate_tests(metafunc):
@@ -26,28 +95,29 @@ def pytest_generate_tests(metafunc):
         if x.is_dir()
     ]
     modules.sort()
+    # READMEs are only scanned again when they change, which also spares
+    # each xdist worker from extracting examples at collection
+    extraction = readme.ExtractionCache(getattr(metafunc.config, 'cache',
+                                                None))
     examples = []
-    ids = []
     for module in modules:
-      readme = module / 'README.md'
-      if not readme.exists():
+      path = module / 'README.md'
+      if not path.exists():
         continue
-      doc = marko.parse(readme.read_text())
-      index = 0
-      last_header = None
-      for child in doc.children:
-        if isinstance(child, marko.block.FencedCode) and child.lang == 'hcl':
-          index += 1
-          code = child.children[0].children
-          if 'tftest skip' in code:
-            continue
-          examples.append(code)
-          name = f'{module.stem}:{last_header}'
-          if index > 1:
-            name += f' {index}'
-          ids.append(name)
-        elif isinstance(child, marko.block.Heading):
-          last_header = child.children[0].children
-          index = 0
-
-    metafunc.parametrize('example', examples, ids=ids)
+      module_examples = extraction.examples(str(path))
+      codes = tuple(code for _, code in module_examples)
+      # keep the examples of a module on the same xdist worker so that
+      # the module's batch is only planned once
+      group = pytest.mark.xdist_group(module.stem)
+      # the README's own module and the modules an example uses are checked
+      # by change-impact selection, besides the test folder
+      examples += [
+          pytest.param(
+              Example(code, module.stem, codes), id=name, marks=[
+                  group,
+                  getattr(pytest.mark, impact.MARKER)(str(module),
+                                                      *_example_sources(code))
+              ]) for name, code in module_examples
+      ]
+
+    metafunc.parametrize('example', examples)
@@ -20,17 +20,30 @@ BASE_PATH = Path(__file__).parent
 EXPECTED_RESOURCES_RE = re.compile(r'# tftest modules=(\d+) resources=(\d+)')
 
 
-def test_example(doc_example_plan_runner, tmp_path, example):
-  (tmp_path / 'modules').symlink_to(
-      Path(BASE_PATH, '../../modules/').resolve())
-  (tmp_path / 'variables.tf').symlink_to(
-      Path(BASE_PATH, 'variables.tf').resolve())
-  (tmp_path / 'main.tf').write_text(example)
-
-  match = EXPECTED_RESOURCES_RE.search(example)
+def test_example(doc_example_plan_runner, doc_example_batches, example_cache,
+                 tmp_path, example):
+  match = EXPECTED_RESOURCES_RE.search(example.code)
   expected_modules = int(match.group(1)) if match is not None else 1
   expected_resources = int(match.group(2)) if match is not None else 1
 
-  num_modules, num_resources = doc_example_plan_runner(str(tmp_path))
+  # examples whose code and modules are unchanged since they were last
+  # planned are checked against the counts from that plan
+  key = counts = None
+  if example_cache is not None:
+    key = example_cache.key(example.code)
+    counts = example_cache.get(key)
+  if counts is None:
+    counts = doc_example_batches(example)
+    if counts is None:
+      (tmp_path / 'modules').symlink_to(
+          Path(BASE_PATH, '../../modules/').resolve())
+      (tmp_path / 'variables.tf').symlink_to(
+          Path(BASE_PATH, 'variables.tf').resolve())
+      (tmp_path / 'main.tf').write_text(example.code)
+      counts = doc_example_plan_runner(str(tmp_path))
+    if key is not None:
+      example_cache.set(key, counts)
+
+  num_modules, num_resources = counts
   assert expected_modules == num_modules
   assert expected_resources == num_resources
@@ -21,6 +21,8 @@ import types
 import pytest
 import tftest
 
+from ..harness import index
+
 
 BASEDIR = os.path.dirname(os.path.dirname(__file__))
 
@@ -31,11 +33,14 @@ def fast_e2e_plan_runner(_plan_runner):
   def run_plan(fixture_path=None, targets=None, refresh=True,
                include_bare_resources=False, compute_sums=True, **tf_vars):
     "Runs Terraform plan on a root module using defaults, returns data."
-    plan = _plan_runner(fixture_path, targets=targets, refresh=refresh,
-                        **tf_vars)
-    root_module = plan.root_module['child_modules'][0]
+    # resource values are never loaded when only counts are returned
+    root_module = _plan_runner.root_module(fixture_path, targets=targets,
+                                           refresh=refresh,
+                                           values=not compute_sums, **tf_vars)
+    root_module = root_module['child_modules'][0]
     modules = {
-        m['address'].removeprefix(root_module['address'])[1:]: m['resources']
+        m['address'].removeprefix(root_module['address'])[1:]:
+        index.PlanIndex(m['resources'])
         for m in root_module['child_modules']
     }
     resources = [r for m in modules.values() for r in m]
@@ -44,5 +49,5 @@ def fast_e2e_plan_runner(_plan_runner):
       resources.extend(bare_resources)
     if compute_sums:
       return len(modules), len(resources), {k: len(v) for k, v in modules.items()}
-    return modules, resources
+    return modules, index.PlanIndex(resources)
   return run_plan
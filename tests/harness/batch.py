@@ -0,0 +1,217 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Synthetic root modules planning several variable sets or examples at once."
+
+import json
+import os
+import re
+
+from . import frozen
+
+VARIABLE_RE = re.compile(
+    r'(?sm)^variable\s*"([^"]+)"\s*\{(?:[ \t]*\}|(.*?)^\})')
+VARIABLE_TYPE_RE = re.compile(r'(?m)^\s{2}type\s*=\s*(.*?)\s*$')
+VARIANT_PREFIX = 'variant_'
+EXAMPLE_PREFIX = 'example_'
+
+
+def variable_types(fixture_path):
+  'Return a dict of variable names and type expressions declared in fixture.'
+  types = {}
+  for name in sorted(os.listdir(fixture_path)):
+    if not name.endswith('.tf'):
+      continue
+    with open(os.path.join(fixture_path, name)) as f:
+      body = f.read()
+    for var_name, var_body in VARIABLE_RE.findall(body):
+      m = VARIABLE_TYPE_RE.search(var_body)
+      types[var_name] = m.group(1) if m else None
+  return types
+
+
+def _expression(value, var_type):
+  'Convert a -var style value to an HCL expression for a module argument.'
+  # tftest passes lists and dicts to -var as JSON, which is valid HCL
+  if isinstance(value, (dict, list)):
+    return json.dumps(value)
+  value = str(value)
+  # CLI values for string and untyped variables are literal strings, all
+  # other values including those of type any are parsed as HCL expressions
+  if var_type in (None, 'string'):
+    value = json.dumps(value).replace('${', '$${').replace('%{', '%%{')
+  return value
+
+
+def render_root(fixture_path, root_path, variants):
+  'Write a root module in root_path calling fixture once per variant.'
+  types = variable_types(fixture_path)
+  source = os.path.relpath(fixture_path, root_path)
+  buffer = []
+  for i, tf_vars in enumerate(variants):
+    buffer.append(f'module "{VARIANT_PREFIX}{i}" {{')
+    buffer.append(f'  source = "{source}"')
+    for k, v in sorted(tf_vars.items()):
+      if k not in types:
+        raise ValueError(f'variable {k} not declared in {fixture_path}')
+      buffer.append(f'  {k} = {_expression(v, types[k])}')
+    buffer.append('}')
+  with open(os.path.join(root_path, 'main.tf'), 'w') as f:
+    f.write('\n'.join(buffer) + '\n')
+
+
+def render_tfvars(fixture_path, path, tf_vars):
+  'Write tf_vars for fixture to a variable definitions file at path.'
+  types = variable_types(fixture_path)
+  buffer = []
+  for k, v in sorted(tf_vars.items()):
+    if k not in types:
+      raise ValueError(f'variable {k} not declared in {fixture_path}')
+    buffer.append(f'{k} = {_expression(v, types[k])}')
+  with open(path, 'w') as f:
+    f.write('\n'.join(buffer) + '\n')
+
+
+def variant_targets(targets, index):
+  'Return targets rewritten to address resources of variant at index.'
+  if not targets:
+    return targets
+  return [f'module.{VARIANT_PREFIX}{index}.{t}' for t in targets]
+
+
+def _strip_address(module, prefix):
+  'Return a copy of a plan module with prefix removed from addresses.'
+  result = dict(module)
+  if 'address' in result:
+    result['address'] = result['address'][len(prefix):]
+  if 'resources' in result:
+    result['resources'] = [
+        dict(r, address=r['address'][len(prefix):]) for r in result['resources']
+    ]
+  if 'child_modules' in result:
+    result['child_modules'] = [
+        _strip_address(m, prefix) for m in result['child_modules']
+    ]
+  return result
+
+
+def _variant_module(root_module, address):
+  'Return the child module at address of a plan root module as a root.'
+  for module in root_module.get('child_modules', []):
+    if module['address'] == address:
+      module = _strip_address(module, address + '.')
+      module.pop('address', None)
+      return module
+  return {}
+
+
+def _variant_changes(changes, address):
+  'Return the resource changes under the module at address, as in a root.'
+  prefix = address + '.'
+  result = []
+  for change in changes:
+    if not change['address'].startswith(prefix):
+      continue
+    change = dict(change, address=change['address'][len(prefix):])
+    module = change.pop('module_address')
+    if module != address:
+      change['module_address'] = module[len(prefix):]
+    result.append(change)
+  return result
+
+
+def split_plan(raw, count):
+  '''Split a raw plan of a synthetic root into one raw plan per variant.
+
+  Planned values, prior state, resource changes and the configuration of each
+  variant module are returned as those of a root module. Outputs and variables
+  of the fixture are not visible from the synthetic root and are left out.
+  '''
+  root_module = raw.get('planned_values', {}).get('root_module', {})
+  prior_module = raw.get('prior_state', {}).get('values',
+                                                {}).get('root_module', {})
+  module_calls = raw.get('configuration', {}).get('root_module',
+                                                  {}).get('module_calls', {})
+  result = []
+  for i in range(count):
+    address = f'module.{VARIANT_PREFIX}{i}'
+    call = module_calls.get(f'{VARIANT_PREFIX}{i}', {})
+    result.append({
+        'format_version': raw.get('format_version'),
+        'terraform_version': raw.get('terraform_version'),
+        'planned_values': {
+            'root_module': _variant_module(root_module, address)
+        },
+        'prior_state': {
+            'values': {
+                'root_module': _variant_module(prior_module, address)
+            }
+        },
+        'resource_changes': _variant_changes(raw.get('resource_changes', []),
+                                             address),
+        'configuration': {
+            'root_module': call.get('module', {})
+        },
+    })
+  return result
+
+
+class VariantPlanOutput(frozen.PlanOutput):
+  'Read-only plan of one variant, refusing access to fields not split.'
+
+  def __init__(self, raw):
+    super().__init__(raw)
+    # tftest defaults missing outputs and variables to empty lookups, which
+    # would make assertions on them silently pass
+    del self.outputs
+    del self.variables
+
+  def __getattr__(self, name):
+    if name.startswith('_'):
+      raise AttributeError(name)
+    if name in self._raw:
+      return super().__getattr__(name)
+    raise AttributeError(
+        f'{name} is not available in plans of plan_runner.many, use plan_runner'
+    )
+
+
+def render_examples(root_path, examples, links):
+  'Write a root module in root_path calling each example as a child module.'
+  buffer = []
+  for i, code in enumerate(examples):
+    name = f'{EXAMPLE_PREFIX}{i}'
+    example_path = os.path.join(root_path, name)
+    os.mkdir(example_path)
+    # examples use paths relative to the root of the repository
+    for link_name, target in links.items():
+      os.symlink(target, os.path.join(example_path, link_name))
+    with open(os.path.join(example_path, 'main.tf'), 'w') as f:
+      f.write(code)
+    buffer.append(f'module "{name}" {{')
+    buffer.append(f'  source = "./{name}"')
+    buffer.append('}')
+  with open(os.path.join(root_path, 'main.tf'), 'w') as f:
+    f.write('\n'.join(buffer) + '\n')
+
+
+def example_counts(plan, count):
+  'Return modules and resources counts for each example in a batch plan.'
+  result = []
+  for i in range(count):
+    example = (plan.modules or {}).get(f'module.{EXAMPLE_PREFIX}{i}')
+    modules = example.child_modules if example is not None else {}
+    result.append(
+        (len(modules), sum(len(m.resources) for m in modules.values())))
+  return result
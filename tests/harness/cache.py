@@ -0,0 +1,154 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Content-addressed on-disk cache for Terraform plan output."
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from . import sources
+
+# bump to invalidate existing cache entries when the key or format changes
+CACHE_VERSION = '2'
+# entries not used for this many seconds, or beyond the most recently used
+# ones, are removed when the cache is pruned
+MAX_AGE = 30 * 86400
+MAX_ENTRIES = 10000
+
+
+class PlanCache(object):
+  'Plan JSON files keyed on fixture sources, variables and Terraform.'
+
+  def __init__(self, path, basedir, binary='terraform'):
+    self.path = str(path)
+    self.basedir = basedir
+    self.binary = binary
+    self._terraform_version = None
+
+  @property
+  def terraform_version(self):
+    'Return the Terraform version string, computed once per run.'
+    if self._terraform_version is None:
+      try:
+        result = subprocess.run([self.binary, 'version'], capture_output=True,
+                                check=False, text=True)
+        self._terraform_version = result.stdout.split('\n')[0]
+      except (IOError, OSError):
+        self._terraform_version = self.binary
+    return self._terraform_version
+
+  def key(self, fixture_path, targets=None, refresh=True, tf_vars=None,
+          variants=None, providers=None):
+    'Return the cache key for a plan of fixture_path with the passed options.'
+    # providers is a digest of the provider versions selected by init, as
+    # fixtures do not lock them and init picks the latest matching release
+    env = sorted((k, v) for k, v in os.environ.items() if k.startswith('TF_VAR_'))
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps([
+            CACHE_VERSION,
+            self.terraform_version,
+            providers,
+            sources.closure_digest(fixture_path, self.basedir),
+            sorted(targets or []),
+            refresh,
+            sorted((k, str(v)) for k, v in (tf_vars or {}).items()),
+            [sorted((k, str(v)) for k, v in t.items()) for t in variants or []],
+            env,
+        ]).encode())
+    return digest.hexdigest()
+
+  def _entry_path(self, key):
+    return os.path.join(self.path, key[:2], f'{key}.json')
+
+  def lookup(self, key):
+    'Return the path of the plan JSON file for key, or None on cache misses.'
+    entry_path = self._entry_path(key)
+    try:
+      # the modification time records the last use for pruning
+      os.utime(entry_path)
+    except FileNotFoundError:
+      return None
+    return entry_path
+
+  def store(self, key, text):
+    'Atomically store the plan JSON text for key, return its path.'
+    entry_path = self._entry_path(key)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path),
+                                    suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'w') as f:
+        f.write(text)
+      os.replace(tmp_path, entry_path)
+    except (IOError, OSError):
+      if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+      raise
+    return entry_path
+
+  def prune(self, max_age=MAX_AGE, max_entries=MAX_ENTRIES):
+    'Remove entries unused for max_age seconds or beyond max_entries.'
+    entries = []
+    for dirpath, _, filenames in os.walk(self.path):
+      for name in filenames:
+        path = os.path.join(dirpath, name)
+        try:
+          entries.append((os.stat(path).st_mtime, path))
+        except FileNotFoundError:
+          pass
+    entries.sort(reverse=True)
+    limit = time.time() - max_age
+    for i, (mtime, path) in enumerate(entries):
+      if i < max_entries and mtime >= limit:
+        continue
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        # pruned concurrently by another xdist worker
+        pass
+
+
+class ExampleCache(object):
+  'Module and resource counts of planned examples, keyed on their sources.'
+
+  def __init__(self, cache, basedir, terraform_version, providers='',
+               extra_files=None):
+    self.cache = cache
+    self.basedir = basedir
+    digest = hashlib.sha256(
+        f'{CACHE_VERSION}{terraform_version}{providers}'.encode())
+    for name in sorted(extra_files or []):
+      with open(name, 'rb') as f:
+        digest.update(f.read())
+    self._salt = digest.hexdigest()
+
+  def key(self, code):
+    'Return the cache key for example code.'
+    return 'tftest/examples/' + hashlib.sha256(
+        (self._salt + sources.code_digest(code, self.basedir, self.basedir)
+        ).encode()).hexdigest()
+
+  def get(self, key):
+    'Return (modules, resources) counts stored for key, or None.'
+    counts = self.cache.get(key, None)
+    return tuple(counts) if counts else None
+
+  def set(self, key, counts):
+    'Store (modules, resources) counts for key.'
+    self.cache.set(key, list(counts))
@@ -0,0 +1,102 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Read-only views over parsed Terraform JSON output."
+
+import copy
+
+import tftest
+
+
+def _readonly(self, *args, **kw):
+  raise TypeError(f'{type(self).__name__} is read-only, copy it first')
+
+
+class FrozenDict(dict):
+  'Dict that refuses in-place changes, deep copies are mutable dicts.'
+
+  __setitem__ = __delitem__ = __ior__ = _readonly
+  clear = pop = popitem = setdefault = update = _readonly
+
+  def __copy__(self):
+    return dict(self)
+
+  def __deepcopy__(self, memo):
+    return {k: copy.deepcopy(v, memo) for k, v in self.items()}
+
+  def __reduce__(self):
+    return (dict, (dict(self),))
+
+
+class FrozenList(list):
+  'List that refuses in-place changes, deep copies are mutable lists.'
+
+  __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+  append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+  def __copy__(self):
+    return list(self)
+
+  def __deepcopy__(self, memo):
+    return [copy.deepcopy(v, memo) for v in self]
+
+  def __reduce__(self):
+    return (list, (list(self),))
+
+
+def freeze(value):
+  'Return a read-only deep view of JSON-like value.'
+  if isinstance(value, (FrozenDict, FrozenList)):
+    return value
+  if isinstance(value, dict):
+    return FrozenDict((k, freeze(v)) for k, v in value.items())
+  if isinstance(value, list):
+    return FrozenList(freeze(v) for v in value)
+  return value
+
+
+class PlanModule(tftest.TerraformPlanModule):
+  'Plan module whose resources and child modules are read-only.'
+
+  @property
+  def child_modules(self):
+    if self._modules is None:
+      self._modules = FrozenDict(
+          (mod['address'][self._strip:], PlanModule(mod))
+          for mod in self._raw.get('child_modules', []))
+    return self._modules
+
+  @property
+  def resources(self):
+    if self._resources is None:
+      self._resources = FrozenDict((res['address'][self._strip:], res)
+                                   for res in self._raw.get('resources', []))
+    return self._resources
+
+
+class PlanOutput(tftest.TerraformPlanOutput):
+  'Read-only plan output, including the lookups built by tftest.'
+
+  def __init__(self, raw):
+    super().__init__(freeze(raw))
+    self.root_module = PlanModule(self.root_module._raw)
+    self.prior_root_module = PlanModule(self.prior_root_module._raw)
+    self.resource_changes = FrozenDict(self.resource_changes)
+    self._frozen = True
+
+  def __setattr__(self, name, value):
+    # plans are shared between tests, attributes cannot be replaced either
+    if self.__dict__.get('_frozen'):
+      _readonly(self)
+    super().__setattr__(name, value)
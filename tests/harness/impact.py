@@ -0,0 +1,175 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Selection of tests affected by the changes since a git reference."
+
+import os
+import re
+import subprocess
+
+from . import sources
+
+# changes to these files can affect every test
+GLOBAL_FILES = ('default-versions.tf',)
+# changes to files in these folders can affect every test
+GLOBAL_DIRS = (os.path.join('tests', 'harness'),)
+MARKER = 'tftest_sources'
+# fixtures referenced by tests as string literals, e.g. 'stage/fixture'
+FIXTURE_RE = re.compile(r'''['"]([\w./-]*fixture)['"]''')
+# data files and folders passed to modules as relative paths
+PATH_RE = re.compile(r'"(\.\.?/[^"$]+)"')
+
+
+def _git(basedir, *args):
+  'Return the output lines of a git command run in basedir.'
+  output = subprocess.check_output(['git'] + list(args), cwd=basedir,
+                                   text=True)
+  return [line for line in output.splitlines() if line]
+
+
+def changed_files(basedir, ref, committed_only=False):
+  'Return absolute paths of files changed since the merge base of ref.'
+  merge_base = _git(basedir, 'merge-base', ref, 'HEAD')[0]
+  if committed_only:
+    # files rewritten in the working tree before running tests, e.g. pinned
+    # versions in CI, are ignored
+    names = _git(basedir, 'diff', '--name-only', '--no-renames', merge_base,
+                 'HEAD')
+  else:
+    # uncommitted changes are compared too, including untracked files
+    names = _git(basedir, 'diff', '--name-only', '--no-renames', merge_base)
+    names += _git(basedir, 'ls-files', '--others', '--exclude-standard')
+  return {os.path.realpath(os.path.join(basedir, name)) for name in names}
+
+
+def _tf_dirs(path):
+  'Return directories containing Terraform files under path.'
+  result = set()
+  for root, dirs, files in os.walk(path):
+    dirs[:] = [d for d in dirs if d not in sources.SKIP_DIRS]
+    if any(f.endswith('.tf') for f in files):
+      result.add(root)
+  return result
+
+
+def _data_paths(path):
+  'Return existing paths outside modules passed as strings in files in path.'
+  result = set()
+  for name in os.listdir(path):
+    if not name.endswith('.tf'):
+      continue
+    with open(os.path.join(path, name)) as f:
+      for value in PATH_RE.findall(f.read()):
+        value = os.path.realpath(os.path.join(path, value))
+        if os.path.exists(value):
+          result.add(value)
+  return result
+
+
+class ImpactPlugin(object):
+  'Deselect tests whose fixtures and modules were not changed since ref.'
+
+  def __init__(self, basedir, ref, committed_only=False):
+    self.basedir = os.path.realpath(basedir)
+    self.tests_dir = os.path.join(self.basedir, 'tests')
+    self.ref = ref
+    self.changed = changed_files(self.basedir, ref, committed_only)
+    self._closures = {}
+
+  def _closure(self, path):
+    'Return paths the module at path depends on, memoized.'
+    path = os.path.realpath(path)
+    if path not in self._closures:
+      result = set()
+      for module_path in sources.module_closure(path):
+        result.add(module_path)
+        result.update(_data_paths(module_path))
+      self._closures[path] = result
+    return self._closures[path]
+
+  def _test_dependencies(self, test_path):
+    'Return paths the tests in test_path depend on.'
+    test_dir = os.path.dirname(os.path.realpath(test_path))
+    fixtures = _tf_dirs(test_dir)
+    with open(test_path) as f:
+      for fixture in FIXTURE_RE.findall(f.read()):
+        for parent in (test_dir, os.path.dirname(test_dir)):
+          fixture_path = os.path.join(parent, fixture)
+          if os.path.isdir(fixture_path):
+            fixtures.add(fixture_path)
+    result = {test_dir}
+    for fixture_path in fixtures:
+      result.update(self._closure(fixture_path))
+    return result
+
+  def _affected(self, paths):
+    'Return True if any changed file is one of paths or inside them.'
+    for changed in self.changed:
+      for path in paths:
+        if changed == path or changed.startswith(path + os.sep):
+          return True
+    return False
+
+  def pytest_report_header(self, config):
+    return f'changed since {self.ref}: {len(self.changed)} files'
+
+  def _is_global(self, path):
+    'Return True if a change to path can affect any test.'
+    relpath = os.path.relpath(path, self.basedir)
+    if relpath in GLOBAL_FILES:
+      return True
+    if any(relpath.startswith(d + os.sep) for d in GLOBAL_DIRS):
+      return True
+    if not path.startswith(self.tests_dir + os.sep):
+      return False
+    name = os.path.basename(path)
+    if name == 'conftest.py':
+      return True
+    # helpers next to a conftest file can be used by any test below it
+    folder = os.path.dirname(path)
+    if (name.endswith('.py') and not name.startswith('test_') and
+        name != '__init__.py' and os.path.exists(os.path.join(folder, 'conftest.py'))):
+      return True
+    # files in a folder with tests, or in its fixtures, only affect those
+    # tests, while the harness and requirements affect all of them
+    current = folder
+    while current != self.tests_dir:
+      if os.path.isdir(current) and any(
+          n.startswith('test_') and n.endswith('.py')
+          for n in os.listdir(current)):
+        return False
+      current = os.path.dirname(current)
+    return True
+
+  def pytest_collection_modifyitems(self, config, items):
+    if any(self._is_global(changed) for changed in self.changed):
+      return
+    dependencies = {}
+    selected, deselected = [], []
+    for item in items:
+      test_path = str(item.fspath)
+      if test_path not in dependencies:
+        dependencies[test_path] = self._test_dependencies(test_path)
+      paths = set(dependencies[test_path])
+      for marker in item.iter_markers(MARKER):
+        for path in marker.args:
+          paths.add(os.path.realpath(path))
+          paths.update(self._closure(path))
+      if self._affected(paths):
+        selected.append(item)
+      else:
+        deselected.append(item)
+    if deselected:
+      config.hook.pytest_deselected(items=deselected)
+      items[:] = selected
@@ -0,0 +1,94 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Indexed, read-only view over the resources of a Terraform plan."
+
+from . import frozen
+
+
+def _skip_key(address, i):
+  'Return the position after the [key] starting at position i of address.'
+  i += 1
+  if address.startswith('"', i):
+    # string keys are quoted and can contain any character, escaped quotes
+    # included
+    i += 1
+    while address[i] != '"':
+      i += 2 if address[i] == '\\' else 1
+    i += 1
+  return address.index(']', i) + 1
+
+
+def module_address(resource):
+  'Return the address of the module containing resource, empty for root.'
+  # module segments are scanned from the start of the address, as for_each
+  # keys of modules and resources can contain any text
+  address = resource['address']
+  end = i = 0
+  while address.startswith('module.', i):
+    i += len('module.')
+    while i < len(address) and address[i] not in '.[':
+      i += 1
+    if address.startswith('[', i):
+      i = _skip_key(address, i)
+    end = i
+    i += 1
+  return address[:end]
+
+
+class PlanIndex(frozen.FrozenList):
+  '''Read-only list of plan resources with constant time lookups.
+
+  Indexes by resource type, address, module address and for_each/count key
+  are built in a single pass the first time any lookup is used, so plain
+  list usage in tests costs nothing extra.
+  '''
+
+  _indexes = None
+
+  def _build(self):
+    if self._indexes is None:
+      indexes = {'type': {}, 'address': {}, 'module': {}, 'key': {}}
+      for resource in self:
+        indexes['address'][resource['address']] = resource
+        for name, value in (('type', resource['type']),
+                            ('module', module_address(resource)),
+                            ('key', resource.get('index'))):
+          indexes[name].setdefault(value, []).append(resource)
+      self._indexes = indexes
+    return self._indexes
+
+  def _lookup(self, name, value):
+    return frozen.FrozenList(self._build()[name].get(value, []))
+
+  @property
+  def types(self):
+    'Return the set of resource types in the index.'
+    return set(self._build()['type'])
+
+  def by_address(self, address):
+    'Return the resource at address, or None.'
+    return self._build()['address'].get(address)
+
+  def by_key(self, key):
+    'Return resources whose for_each or count key is key.'
+    return self._lookup('key', key)
+
+  def by_module(self, module):
+    'Return resources directly contained in module, empty string for root.'
+    return self._lookup('module', module)
+
+  def by_type(self, resource_type):
+    'Return resources of resource_type.'
+    return self._lookup('type', resource_type)
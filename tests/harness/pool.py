@@ -0,0 +1,149 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Bounded pool of Terraform execution slots shared by pytest-xdist workers."
+
+import contextlib
+import glob
+import json
+import os
+import time
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+# estimated peak memory of a Terraform plan including the Google provider
+SLOT_MEMORY = 1024 * 1024 * 1024
+POLL_INTERVAL = 0.05
+POLL_INTERVAL_MAX = 0.5
+
+
+def _available_memory():
+  'Return available memory in bytes, or None if it cannot be determined.'
+  try:
+    with open('/proc/meminfo') as f:
+      for line in f:
+        if line.startswith('MemAvailable:'):
+          return int(line.split()[1]) * 1024
+  except (IOError, OSError, ValueError):
+    pass
+  try:
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+  except (AttributeError, ValueError, OSError):
+    return None
+
+
+def default_size():
+  'Return a pool size based on available CPU cores and memory.'
+  try:
+    cpus = len(os.sched_getaffinity(0))
+  except AttributeError:
+    cpus = os.cpu_count() or 1
+  memory = _available_memory()
+  if memory is None:
+    return cpus
+  return max(1, min(cpus, memory // SLOT_MEMORY))
+
+
+@contextlib.contextmanager
+def file_lock(path):
+  'Context manager holding an exclusive lock on the file at path.'
+  if fcntl is None:
+    yield
+    return
+  with open(path, 'a') as f:
+    fcntl.flock(f, fcntl.LOCK_EX)
+    try:
+      yield
+    finally:
+      fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Pool(object):
+  'Cross-process semaphore implemented with one locked file per slot.'
+
+  def __init__(self, path, size, worker='main'):
+    self.path = path
+    self.size = max(1, int(size))
+    self.worker = worker
+    self.waits = []
+    self.depths = []
+    os.makedirs(os.path.join(path, 'waiting'), exist_ok=True)
+
+  def _acquire(self):
+    'Block until a slot is free, return its open file.'
+    interval = POLL_INTERVAL
+    while True:
+      for i in range(self.size):
+        f = open(os.path.join(self.path, f'slot-{i}'), 'a')
+        try:
+          fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+          f.close()
+          continue
+        return f
+      time.sleep(interval)
+      interval = min(interval * 2, POLL_INTERVAL_MAX)
+
+  @contextlib.contextmanager
+  def slot(self):
+    'Context manager holding one of the pool slots.'
+    if fcntl is None:
+      yield
+      return
+    marker = os.path.join(self.path, 'waiting',
+                          f'{self.worker}-{os.getpid()}-{len(self.waits)}')
+    open(marker, 'w').close()
+    start = time.monotonic()
+    try:
+      self.depths.append(len(os.listdir(os.path.dirname(marker))))
+      f = self._acquire()
+    finally:
+      os.unlink(marker)
+    self.waits.append(time.monotonic() - start)
+    try:
+      yield
+    finally:
+      fcntl.flock(f, fcntl.LOCK_UN)
+      f.close()
+
+  def dump(self):
+    'Write this worker\'s statistics to the pool folder.'
+    with open(os.path.join(self.path, f'stats-{self.worker}.json'), 'w') as f:
+      json.dump({'waits': self.waits, 'depths': self.depths}, f)
+
+
+def summarize(path):
+  'Return aggregated statistics from all workers using the pool at path.'
+  waits, depths = [], []
+  for name in glob.glob(os.path.join(path, 'stats-*.json')):
+    try:
+      with open(name) as f:
+        stats = json.load(f)
+    except (IOError, OSError, ValueError):
+      continue
+    waits += stats['waits']
+    depths += stats['depths']
+  if not waits:
+    return
+  return {
+      'runs': len(waits),
+      'wait_total': sum(waits),
+      'wait_mean': sum(waits) / len(waits),
+      'wait_max': max(waits),
+      'depth_mean': sum(depths) / len(depths),
+      'depth_max': max(depths),
+  }
@@ -0,0 +1,136 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Line based extraction of code examples from README files."
+
+import hashlib
+import os
+import re
+
+# bump when the scanner changes to invalidate cached extractions
+SCANNER_VERSION = '1'
+
+FENCE_RE = re.compile(r'^( {0,3})(`{3,}|~{3,})\s*([^\s`]*)')
+HEADING_RE = re.compile(r'^ {0,3}#{1,6}(?:\s+(.*?))?(?:\s+#+)?\s*$')
+HEADING_MARKUP_RE = re.compile(r'[`*\[<]')
+LIST_RE = re.compile(r'^ {0,3}(?:[-+*]|\d{1,9}[.)])\s')
+CODE_SPAN_RE = re.compile(r'^(`+)(.+?)\1')
+
+
+def _heading_text(text):
+  'Return the first inline text of a heading, as used in test ids.'
+  m = CODE_SPAN_RE.match(text)
+  if m:
+    return m.group(2).strip()
+  m = HEADING_MARKUP_RE.search(text)
+  return text[:m.start()] if m else text
+
+
+def scan(text):
+  'Yield headings as (None, text) and top level fenced code as (lang, code).'
+  lines = text.splitlines(keepends=True)
+  in_list = False
+  i = 0
+  while i < len(lines):
+    line = lines[i]
+    i += 1
+    if not line.strip():
+      continue
+    fence = FENCE_RE.match(line)
+    if fence and fence.group(2)[0] == '`' and '`' in line[fence.end(2):]:
+      fence = None
+    if fence:
+      indent, marker, lang = fence.groups()
+      closing = re.compile(r'^ {0,3}%s{%d,}\s*$' % (re.escape(marker[0]),
+                                                    len(marker)))
+      code = []
+      while i < len(lines) and not closing.match(lines[i]):
+        content = lines[i]
+        strip = len(content) - len(content.lstrip(' '))
+        code.append(content[min(strip, len(indent)):])
+        i += 1
+      i += 1
+      # fences indented under a list item belong to the item
+      if not (in_list and indent):
+        yield lang, ''.join(code)
+      continue
+    if LIST_RE.match(line):
+      in_list = True
+    elif not line[0].isspace():
+      in_list = False
+    m = HEADING_RE.match(line)
+    if m:
+      yield None, _heading_text(m.group(1) or '')
+      in_list = False
+
+
+def examples(path):
+  'Return (name, code) pairs for the testable HCL examples of a README.'
+  module = os.path.basename(os.path.dirname(path))
+  result = []
+  index = 0
+  last_heading = None
+  for lang, text in scan(_read(path)):
+    if lang is None:
+      last_heading = text
+      index = 0
+      continue
+    if lang != 'hcl':
+      continue
+    index += 1
+    if 'tftest skip' in text:
+      continue
+    name = f'{module}:{last_heading}'
+    if index > 1:
+      name += f' {index}'
+    result.append((name, text))
+  return result
+
+
+def _read(path):
+  with open(path, encoding='utf-8') as f:
+    return f.read()
+
+
+class ExtractionCache(object):
+  'Examples extracted from README files, kept in the pytest cache.'
+
+  def __init__(self, cache):
+    self.cache = cache
+
+  def examples(self, path):
+    'Return examples for path, scanning it only if it changed.'
+    key = 'tftest/readme/' + os.path.basename(os.path.dirname(path))
+    stat = os.stat(path)
+    entry = self.cache.get(key, None) if self.cache is not None else None
+    if entry and entry['version'] == SCANNER_VERSION:
+      if (entry['mtime'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+        return [tuple(e) for e in entry['examples']]
+    with open(path, 'rb') as f:
+      digest = hashlib.sha256(f.read()).hexdigest()
+    if entry and entry['version'] == SCANNER_VERSION and (entry['sha256']
+                                                          == digest):
+      result = [tuple(e) for e in entry['examples']]
+    else:
+      result = examples(path)
+    if self.cache is not None:
+      self.cache.set(
+          key, {
+              'version': SCANNER_VERSION,
+              'mtime': stat.st_mtime_ns,
+              'size': stat.st_size,
+              'sha256': digest,
+              'examples': result,
+          })
+    return result
@@ -0,0 +1,102 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Discovery and hashing of the Terraform sources a fixture depends on."
+
+import hashlib
+import os
+import re
+
+# same shape as the module blocks matched by tfdoc, but tolerant of arguments
+# declared before source in the module block
+MODULE_SOURCE_RE = re.compile(
+    r'(?sm)module\s*"[^"]+"\s*\{.*?^\s*source\s*=\s*"([^"]+)"')
+SKIP_DIRS = ('.git', '.terraform')
+SKIP_FILES = ('.terraform.tfstate.lock.info', 'terraform.tfstate',
+              'terraform.tfstate.backup')
+
+_DIGESTS = {}
+
+
+def local_sources(path):
+  'Return the resolved local module sources referenced by files in path.'
+  sources = set()
+  for name in sorted(os.listdir(path)):
+    if not name.endswith('.tf'):
+      continue
+    try:
+      with open(os.path.join(path, name)) as f:
+        body = f.read()
+    except (IOError, OSError):
+      continue
+    for source in MODULE_SOURCE_RE.findall(body):
+      if source.startswith('./') or source.startswith('../'):
+        sources.add(os.path.realpath(os.path.join(path, source)))
+  return sources
+
+
+def module_closure(path):
+  'Return the set of directories transitively referenced by module in path.'
+  path = os.path.realpath(path)
+  seen = set()
+  queue = [path]
+  while queue:
+    current = queue.pop()
+    if current in seen or not os.path.isdir(current):
+      continue
+    seen.add(current)
+    queue.extend(local_sources(current))
+  return seen
+
+
+def tree_digest(path):
+  'Return a digest of file names and contents under path, memoized per run.'
+  path = os.path.realpath(path)
+  if path in _DIGESTS:
+    return _DIGESTS[path]
+  digest = hashlib.sha256()
+  for root, dirs, files in os.walk(path, followlinks=True):
+    dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+    for name in sorted(files):
+      if name in SKIP_FILES:
+        continue
+      file_path = os.path.join(root, name)
+      digest.update(os.path.relpath(file_path, path).encode())
+      digest.update(b'\0')
+      try:
+        with open(file_path, 'rb') as f:
+          digest.update(hashlib.sha256(f.read()).digest())
+      except (IOError, OSError):
+        continue
+  _DIGESTS[path] = digest.hexdigest()
+  return _DIGESTS[path]
+
+
+def closure_digest(path, basedir):
+  'Return a digest of the module at path and every local module it uses.'
+  digest = hashlib.sha256()
+  for module_path in sorted(module_closure(path)):
+    digest.update(os.path.relpath(module_path, basedir).encode())
+    digest.update(b'\0')
+    digest.update(tree_digest(module_path).encode())
+  return digest.hexdigest()
+
+
+def code_digest(code, path, basedir):
+  'Return a digest of code and the local modules it references from path.'
+  digest = hashlib.sha256(code.encode())
+  for source in sorted(set(MODULE_SOURCE_RE.findall(code))):
+    if source.startswith('./') or source.startswith('../'):
+      digest.update(closure_digest(os.path.join(path, source), basedir).encode())
+  return digest.hexdigest()
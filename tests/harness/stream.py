@@ -0,0 +1,90 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Streaming loader for the root module of Terraform JSON plans."
+
+import json
+import re
+
+from . import frozen
+
+try:
+  import ijson
+except ImportError:
+  ijson = None
+
+VALUE_KEYS = ('values', 'sensitive_values')
+VALUES_RE = re.compile(r'\.resources\.item\.(?:values|sensitive_values)(?:\.|$)')
+ROOT_PREFIX = 'planned_values.root_module'
+
+
+def _build(events, prefix, skip_values=False):
+  'Build the object found at prefix from ijson events, then stop parsing.'
+  stack, keys = [], []
+  for event_prefix, event, value in events:
+    if event_prefix != prefix and not event_prefix.startswith(prefix + '.'):
+      continue
+    if skip_values and VALUES_RE.search(event_prefix):
+      continue
+    if event == 'map_key':
+      keys[-1] = value
+      continue
+    if event in ('end_map', 'end_array'):
+      value = stack.pop()
+      keys.pop()
+      if not stack:
+        return value
+    elif event in ('start_map', 'start_array'):
+      container = {} if event == 'start_map' else []
+      if stack:
+        _add(stack[-1], keys[-1], container)
+      stack.append(container)
+      keys.append(None)
+    elif stack:
+      _add(stack[-1], keys[-1], value)
+    else:
+      return value
+  return {}
+
+
+def _add(container, key, value):
+  if isinstance(container, list):
+    container.append(value)
+  else:
+    container[key] = value
+
+
+def _strip_values(module):
+  'Remove values from resources in a module tree.'
+  for resource in module.get('resources', []):
+    for key in VALUE_KEYS:
+      resource.pop(key, None)
+  for child in module.get('child_modules', []):
+    _strip_values(child)
+
+
+def _read_root_module(path, skip_values=False):
+  'Return the planned values root module from the plan JSON file at path.'
+  with open(path, 'rb') as f:
+    if ijson is not None:
+      return _build(ijson.parse(f, use_float=True), ROOT_PREFIX, skip_values)
+    root_module = json.load(f).get('planned_values', {}).get('root_module', {})
+  if skip_values:
+    _strip_values(root_module)
+  return root_module
+
+
+def load_root_module(path, values=True):
+  'Stream the root module from a plan file, optionally skipping values.'
+  return frozen.freeze(_read_root_module(path, skip_values=not values))
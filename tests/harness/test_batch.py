@@ -0,0 +1,215 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test synthetic roots and tfvars files, and the split of their plans."
+
+import pytest
+
+from . import batch
+
+VARIABLES = '''
+variable "untyped" {}
+
+variable "name" {
+  type = string
+}
+
+variable "subnets" {
+  type = any
+}
+
+variable "size" {
+  type = number
+}
+
+variable "enabled" {
+  type = bool
+}
+
+variable "labels" {
+  type    = map(string)
+  default = {}
+}
+'''
+
+
+@pytest.fixture
+def fixture_path(tmp_path):
+  "Returns the path of a fixture declaring variables of each type."
+  path = tmp_path / 'fixture'
+  path.mkdir()
+  (path / 'variables.tf').write_text(VARIABLES)
+  return str(path)
+
+
+@pytest.mark.parametrize('value,var_type,expected', [
+    ('foo', 'string', '"foo"'),
+    ('${var.x} %{if}', 'string', '"$${var.x} %%{if}"'),
+    ('[1]', None, '"[1]"'),
+    ('[{name="a"}]', 'any', '[{name="a"}]'),
+    ('{a = 1}', 'map(number)', '{a = 1}'),
+    (3, 'number', '3'),
+    ('3', 'number', '3'),
+    ('true', 'bool', 'true'),
+    (['a', 'b'], 'list(string)', '["a", "b"]'),
+    ({'a': 1}, 'any', '{"a": 1}'),
+    ({'a': 1}, None, '{"a": 1}'),
+])
+def test_expression(value, var_type, expected):
+  "Test that only string and untyped values are quoted."
+  assert batch._expression(value, var_type) == expected
+
+
+def test_variable_types(fixture_path):
+  "Test type expressions of variables, including one-line declarations."
+  assert batch.variable_types(fixture_path) == {
+      'untyped': None,
+      'name': 'string',
+      'subnets': 'any',
+      'size': 'number',
+      'enabled': 'bool',
+      'labels': 'map(string)',
+  }
+
+
+def test_render_root(fixture_path, tmp_path):
+  "Test module calls for variants, and undeclared variables."
+  root_path = tmp_path / 'root'
+  root_path.mkdir()
+  batch.render_root(fixture_path, str(root_path), [{
+      'name': 'a',
+      'subnets': '[{name="a"}]'
+  }, {
+      'size': 2
+  }])
+  assert (root_path / 'main.tf').read_text() == '\n'.join([
+      'module "variant_0" {',
+      '  source = "../fixture"',
+      '  name = "a"',
+      '  subnets = [{name="a"}]',
+      '}',
+      'module "variant_1" {',
+      '  source = "../fixture"',
+      '  size = 2',
+      '}',
+  ]) + '\n'
+  with pytest.raises(ValueError):
+    batch.render_root(fixture_path, str(root_path), [{'missing': 1}])
+
+
+def test_render_tfvars(fixture_path, tmp_path):
+  "Test variable definitions matching -var values of each type."
+  path = tmp_path / 'test.tfvars'
+  batch.render_tfvars(
+      fixture_path, str(path), {
+          'untyped': '[1]',
+          'name': 'a',
+          'subnets': '[{name="a"}]',
+          'size': 3,
+          'enabled': 'true',
+          'labels': {
+              'a': 'b'
+          },
+      })
+  assert path.read_text() == '\n'.join([
+      'enabled = true',
+      'labels = {"a": "b"}',
+      'name = "a"',
+      'size = 3',
+      'subnets = [{name="a"}]',
+      'untyped = "[1]"',
+  ]) + '\n'
+  with pytest.raises(ValueError):
+    batch.render_tfvars(fixture_path, str(path), {'missing': 1})
+
+
+def _resource(address):
+  "Returns a planned resource."
+  return {'address': address, 'mode': 'managed', 'type': 'null_resource'}
+
+
+def _change(address, module=None):
+  "Returns a resource change."
+  change = {'address': address, 'change': {'actions': ['create']}}
+  if module is not None:
+    change['module_address'] = module
+  return change
+
+
+RAW_PLAN = {
+    'format_version': '1.1',
+    'terraform_version': '1.3.0',
+    'planned_values': {
+        'outputs': {},
+        'root_module': {
+            'child_modules': [{
+                'address': 'module.variant_0',
+                'resources': [_resource('module.variant_0.null_resource.a')],
+                'child_modules': [{
+                    'address': 'module.variant_0.module.b',
+                    'resources': [
+                        _resource('module.variant_0.module.b.null_resource.b')
+                    ],
+                }],
+            }, {
+                'address': 'module.variant_1',
+                'resources': [_resource('module.variant_1.null_resource.a')],
+            }]
+        },
+    },
+    'resource_changes': [
+        _change('module.variant_0.null_resource.a', 'module.variant_0'),
+        _change('module.variant_0.module.b.null_resource.b',
+                'module.variant_0.module.b'),
+        _change('module.variant_1.null_resource.a', 'module.variant_1'),
+    ],
+    'configuration': {
+        'root_module': {
+            'module_calls': {
+                'variant_0': {
+                    'source': '../fixture',
+                    'module': {
+                        'resources': [{
+                            'address': 'null_resource.a'
+                        }]
+                    },
+                },
+            }
+        }
+    },
+}
+
+
+def test_split_plan():
+  "Test that values, changes and configuration are split by variant."
+  first, second = [
+      batch.VariantPlanOutput(r) for r in batch.split_plan(RAW_PLAN, 2)
+  ]
+  assert list(first.resources) == ['null_resource.a']
+  assert list(first.modules) == ['module.b']
+  assert list(first.modules['module.b'].resources) == ['null_resource.b']
+  assert first.resource_changes == {
+      'null_resource.a': _change('null_resource.a'),
+      'module.b.null_resource.b': _change('module.b.null_resource.b',
+                                          'module.b'),
+  }
+  assert first.configuration['root_module']['resources'] == [{
+      'address': 'null_resource.a'
+  }]
+  assert list(second.resources) == ['null_resource.a']
+  assert list(second.resource_changes) == ['null_resource.a']
+  assert second.configuration == {'root_module': {}}
+  for name in ('outputs', 'variables', 'output_changes'):
+    with pytest.raises(AttributeError, match='plan_runner.many'):
+      getattr(first, name)
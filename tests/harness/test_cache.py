@@ -0,0 +1,49 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test keys and pruning of the on-disk plan cache."
+
+import os
+import time
+
+from . import cache
+
+
+def test_key_providers(tmp_path):
+  "Test that plans are keyed on the provider versions selected by init."
+  fixture_path = tmp_path / 'fixture'
+  fixture_path.mkdir()
+  (fixture_path / 'main.tf').write_text('')
+  plan_cache = cache.PlanCache(tmp_path / 'plans', str(tmp_path), 'true')
+  key = plan_cache.key(str(fixture_path), providers='a')
+  assert key == plan_cache.key(str(fixture_path), providers='a')
+  assert key != plan_cache.key(str(fixture_path), providers='b')
+
+
+def test_prune(tmp_path):
+  "Test that entries are removed by age of last use, then by count."
+  plan_cache = cache.PlanCache(tmp_path / 'plans', str(tmp_path), 'true')
+  now = time.time()
+  paths = {}
+  for i, key in enumerate(('aa1', 'bb2', 'cc3', 'dd4')):
+    paths[key] = plan_cache.store(key, '{}')
+    os.utime(paths[key], (now - i * 86400, now - i * 86400))
+  # looking up an entry records its use
+  os.utime(paths['dd4'], (now - 90 * 86400, now - 90 * 86400))
+  assert plan_cache.lookup('dd4') == paths['dd4']
+  assert plan_cache.lookup('ee5') is None
+  plan_cache.prune(max_age=2.5 * 86400, max_entries=2)
+  assert sorted(k for k, p in paths.items() if os.path.exists(p)) == [
+      'aa1', 'dd4'
+  ]
@@ -0,0 +1,68 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test read-only plans shared between tests."
+
+import copy
+
+import pytest
+
+from . import frozen
+
+RESOURCE = {'address': 'module.a.null_resource.b', 'values': {'x': [1]}}
+PLAN = {
+    'planned_values': {
+        'root_module': {
+            'child_modules': [{
+                'address': 'module.a',
+                'resources': [RESOURCE],
+                'child_modules': [{
+                    'address': 'module.a.module.c'
+                }],
+            }]
+        },
+        'outputs': {
+            'o': {
+                'value': 1
+            }
+        },
+    },
+    'resource_changes': [{
+        'address': RESOURCE['address'],
+        'change': {
+            'actions': ['create']
+        }
+    }],
+}
+
+
+def test_plan_output():
+  "Test that lookups built from plans refuse changes."
+  plan = frozen.PlanOutput(copy.deepcopy(PLAN))
+  module = plan.modules['module.a']
+  assert module.resources['null_resource.b']['values'] == {'x': [1]}
+  assert list(module.child_modules) == ['module.c']
+  assert plan.outputs['o'] == 1
+  for container in (plan.modules, module.resources, module.child_modules,
+                    plan.resource_changes, plan.resource_changes[
+                        RESOURCE['address']]['change']['actions']):
+    with pytest.raises(TypeError):
+      container.clear()
+  with pytest.raises(TypeError):
+    plan.modules['module.b'] = module
+  with pytest.raises(TypeError):
+    plan.outputs = {}
+  changes = copy.deepcopy(plan.resource_changes)
+  changes.clear()
+  assert plan.resource_changes
@@ -0,0 +1,133 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test listing of files changed since a git reference."
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from . import impact
+
+
+def _git(path, *args):
+  "Runs a git command in path."
+  subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=t@t'] +
+                 list(args), cwd=path, check=True, capture_output=True)
+
+
+def _init(path, files):
+  "Initializes a repository at path with files, then a feature branch."
+  if shutil.which('git') is None:
+    pytest.skip('needs git')
+  for name in files:
+    (path / name).parent.mkdir(parents=True, exist_ok=True)
+    (path / name).write_text(files[name] if isinstance(files, dict) else '')
+  _git(path, 'init', '-q', '-b', 'main')
+  _git(path, 'add', '.')
+  _git(path, 'commit', '-q', '-m', 'base')
+  _git(path, 'checkout', '-q', '-b', 'feature')
+
+
+@pytest.fixture
+def repo(tmp_path):
+  "Returns a git repository with a main branch and a feature branch."
+
+  def git(*args):
+    _git(tmp_path, *args)
+
+  _init(tmp_path, ('committed', 'modified', 'staged'))
+  (tmp_path / 'committed').write_text('a')
+  git('commit', '-q', '-am', 'change')
+  (tmp_path / 'modified').write_text('a')
+  (tmp_path / 'staged').write_text('a')
+  git('add', 'staged')
+  (tmp_path / 'untracked').write_text('')
+  return os.path.realpath(tmp_path)
+
+
+def test_changed_files(repo):
+  "Test that uncommitted and untracked files are included by default."
+  assert impact.changed_files(repo, 'main') == {
+      os.path.join(repo, name)
+      for name in ('committed', 'modified', 'staged', 'untracked')
+  }
+  assert impact.changed_files(repo, 'main', committed_only=True) == {
+      os.path.join(repo, 'committed')
+  }
+
+
+class _Item(object):
+  "Minimal collected test item."
+
+  def __init__(self, path):
+    self.fspath = path
+
+  def iter_markers(self, name):
+    return []
+
+
+class _Config(object):
+  "Minimal pytest config recording deselected items."
+
+  def __init__(self):
+    self.deselected = []
+    self.hook = self
+
+  def pytest_deselected(self, items):
+    self.deselected += items
+
+
+def _fixture(name):
+  "Returns a fixture calling a module."
+  return f'module "m" {{\n  source = "../../../../modules/{name}"\n}}\n'
+
+
+SUITE = {
+    'modules/a/main.tf': '',
+    'modules/b/main.tf': '',
+    'tests/conftest.py': '',
+    'tests/harness/cache.py': '',
+    'tests/harness/test_cache.py': '',
+    'tests/fast/conftest.py': '',
+    'tests/fast/helpers.py': '',
+    'tests/modules/a/fixture/main.tf': _fixture('a'),
+    'tests/modules/a/test_plan.py': '',
+    'tests/modules/b/fixture/main.tf': _fixture('b'),
+    'tests/modules/b/test_plan.py': '',
+}
+
+
+@pytest.mark.parametrize('changed,selected', [
+    ('tests/modules/a/fixture/main.tf', ['tests/modules/a/test_plan.py']),
+    ('modules/b/main.tf', ['tests/modules/b/test_plan.py']),
+    ('tests/harness/cache.py', None),
+    ('tests/harness/test_cache.py', None),
+    ('tests/fast/helpers.py', None),
+])
+def test_selection(tmp_path, changed, selected):
+  "Test that changes to the harness and shared helpers select all tests."
+  _init(tmp_path, SUITE)
+  (tmp_path / changed).write_text('# changed')
+  plugin = impact.ImpactPlugin(str(tmp_path), 'main')
+  tests = [
+      'tests/harness/test_cache.py', 'tests/modules/a/test_plan.py',
+      'tests/modules/b/test_plan.py'
+  ]
+  items = [_Item(os.path.join(plugin.basedir, t)) for t in tests]
+  plugin.pytest_collection_modifyitems(_Config(), items)
+  assert [os.path.relpath(i.fspath, plugin.basedir)
+          for i in items] == (selected or tests)
@@ -0,0 +1,69 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test lookups over the resources of a plan."
+
+import pytest
+
+from . import index
+
+
+def _resource(address, type='null_resource', name='a', mode='managed',
+              key=None):
+  "Returns a planned resource."
+  resource = {'address': address, 'mode': mode, 'type': type, 'name': name}
+  if key is not None:
+    resource['index'] = key
+  return resource
+
+
+@pytest.mark.parametrize('address,module', [
+    ('null_resource.a', ''),
+    ('null_resource.a["module.x.null_resource.a"]', ''),
+    ('data.null_data_source.a', ''),
+    ('module.m.null_resource.a', 'module.m'),
+    ('module.m.module.n.null_resource.a[0]', 'module.m.module.n'),
+    ('module.m["x"].null_resource.a', 'module.m["x"]'),
+    ('module.m["a.null_resource.a"].null_resource.a["k.null_resource.a"]',
+     'module.m["a.null_resource.a"]'),
+    ('module.m["a\\"].b"].module.n[1].data.null_data_source.a',
+     'module.m["a\\"].b"].module.n[1]'),
+])
+def test_module_address(address, module):
+  "Test module addresses of root, nested and for_each resources."
+  assert index.module_address({'address': address}) == module
+
+
+def test_plan_index():
+  "Test lookups by type, address, module and key."
+  resources = [
+      _resource('null_resource.a'),
+      _resource('module.m.null_resource.a["x"]', key='x'),
+      _resource('module.m.null_resource.a["module.m.null_resource.a"]',
+                key='module.m.null_resource.a'),
+      _resource('module.m["k"].random_id.a', type='random_id'),
+  ]
+  plan_index = index.PlanIndex(resources)
+  assert plan_index == resources
+  assert plan_index.types == {'null_resource', 'random_id'}
+  assert plan_index.by_address('module.m.null_resource.a["x"]') == resources[1]
+  assert plan_index.by_address('missing') is None
+  assert plan_index.by_module('') == resources[:1]
+  assert plan_index.by_module('module.m') == resources[1:3]
+  assert plan_index.by_module('module.m["k"]') == resources[3:]
+  assert plan_index.by_key('x') == resources[1:2]
+  assert plan_index.by_type('random_id') == resources[3:]
+  assert plan_index.by_type('missing') == []
+  with pytest.raises(TypeError):
+    plan_index.by_type('random_id').append(resources[0])
@@ -0,0 +1,50 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test locks shared by processes running Terraform."
+
+import threading
+import time
+
+import pytest
+
+from . import pool
+from . import workspace
+
+
+@pytest.mark.skipif(pool.fcntl is None, reason='needs fcntl')
+def test_init_lock(tmp_path):
+  "Test that inits sharing a plugin cache never overlap."
+  init = workspace.InitCache(str(tmp_path), 'true',
+                             plugin_cache_dir=str(tmp_path / 'plugins'))
+  assert init.init_lock == str(tmp_path / 'plugins.lock')
+  lock = threading.Lock()
+  active = []
+  peak = []
+
+  def run():
+    with init._slot():
+      with lock:
+        active.append(1)
+        peak.append(len(active))
+      time.sleep(0.05)
+      with lock:
+        active.pop()
+
+  threads = [threading.Thread(target=run) for _ in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert max(peak) == 1
@@ -0,0 +1,80 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test root modules streamed from plan files, with or without values."
+
+import json
+
+import pytest
+
+from . import stream
+
+
+def _resource(address, values):
+  "Returns a planned resource."
+  return {
+      'address': address,
+      'mode': 'managed',
+      'type': 'null_resource',
+      'values': values,
+      'sensitive_values': {},
+  }
+
+
+PLAN = {
+    'format_version': '1.0',
+    'planned_values': {
+        'root_module': {
+            'resources': [_resource('null_resource.a', {'a': [1]})],
+            'child_modules': [{
+                'address': 'module.b',
+                'resources': [_resource('module.b.null_resource.b', {'b': 2})],
+            }],
+        }
+    },
+}
+
+
+@pytest.fixture(params=['ijson', 'json'])
+def plan_path(request, tmp_path, monkeypatch):
+  "Returns the path of a plan file, read with and without ijson."
+  if request.param == 'json':
+    monkeypatch.setattr(stream, 'ijson', None)
+  elif stream.ijson is None:
+    pytest.skip('needs ijson')
+  path = tmp_path / 'plan.json'
+  path.write_text(json.dumps(PLAN))
+  return str(path)
+
+
+def test_root_module(plan_path):
+  "Test that streamed root modules match the plan."
+  root_module = stream.load_root_module(plan_path)
+  assert root_module == PLAN['planned_values']['root_module']
+  with pytest.raises(TypeError):
+    root_module['resources'][0]['values']['a'].append(2)
+
+
+def test_skip_values(plan_path):
+  "Test that resource values are skipped, leaving other keys."
+  root_module = stream.load_root_module(plan_path, values=False)
+  resource, = root_module['resources']
+  other, = root_module['child_modules'][0]['resources']
+  assert resource == {
+      'address': 'null_resource.a',
+      'mode': 'managed',
+      'type': 'null_resource'
+  }
+  assert 'values' not in other and 'sensitive_values' not in other
+  assert root_module['child_modules'][0]['address'] == 'module.b'
@@ -0,0 +1,149 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Per-test timing of Terraform harness phases, and its pytest plugin."
+
+import collections
+import contextlib
+import glob
+import json
+import os
+import time
+
+import tftest
+
+PHASES = ('cache', 'workspace', 'init', 'plan', 'show', 'parse', 'apply', 'output')
+
+
+def current_test():
+  'Return the node id of the test being run, or an empty string.'
+  return os.environ.get('PYTEST_CURRENT_TEST', '').rsplit(' ', 1)[0]
+
+
+class Timings(object):
+  'Wall time of harness phases, aggregated per test and per fixture.'
+
+  def __init__(self):
+    self.tests = collections.defaultdict(collections.Counter)
+    self.fixtures = collections.defaultdict(collections.Counter)
+
+  def add(self, phase, elapsed, fixture=None):
+    'Add elapsed seconds for phase to the current test and to fixture.'
+    self.tests[current_test()][phase] += elapsed
+    if fixture:
+      self.fixtures[fixture][phase] += elapsed
+
+  @contextlib.contextmanager
+  def phase(self, phase, fixture=None):
+    'Context manager timing a block of code as phase.'
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.add(phase, time.perf_counter() - start, fixture)
+
+  def dump(self, path):
+    'Write timings to a JSON file at path.'
+    with open(path, 'w') as f:
+      json.dump({'tests': self.tests, 'fixtures': self.fixtures}, f)
+
+  def load(self, path):
+    'Merge timings from a JSON file written by dump.'
+    with open(path) as f:
+      data = json.load(f)
+    for attr in ('tests', 'fixtures'):
+      for k, v in data[attr].items():
+        getattr(self, attr)[k].update(v)
+
+
+class TimedTerraformTest(tftest.TerraformTest):
+  'TerraformTest recording the time spent in each Terraform command.'
+
+  def __init__(self, tfdir, basedir=None, binary='terraform', env=None,
+               timings=None, fixture=None):
+    super().__init__(tfdir, basedir, binary, env=env)
+    self.timings = timings or Timings()
+    self.fixture = fixture
+    self._commands = 0.0
+
+  def execute_command(self, cmd, *cmd_args):
+    start = time.perf_counter()
+    try:
+      return super().execute_command(cmd, *cmd_args)
+    finally:
+      elapsed = time.perf_counter() - start
+      self._commands += elapsed
+      self.timings.add(cmd, elapsed, self.fixture)
+
+  def plan(self, *args, **kw):
+    # plan and show are recorded by execute_command, the remainder of the
+    # elapsed time is spent decoding the JSON plan
+    start, commands = time.perf_counter(), self._commands
+    try:
+      return super().plan(*args, **kw)
+    finally:
+      elapsed = time.perf_counter() - start - (self._commands - commands)
+      self.timings.add('parse', elapsed, self.fixture)
+
+  def plan_json(self, **kw):
+    'Run plan and return the JSON plan as text, without decoding it.'
+    formatter, self._plan_formatter = self._plan_formatter, lambda out: out
+    try:
+      return self.plan(output=True, **kw)
+    finally:
+      self._plan_formatter = formatter
+
+
+class TimingPlugin(object):
+  'Pytest plugin reporting the slowest tests and fixtures.'
+
+  def __init__(self, config, session_dir):
+    self.config = config
+    self.session_dir = session_dir
+    self.timings = Timings()
+    self.worker = os.environ.get('PYTEST_XDIST_WORKER')
+
+  def pytest_runtest_teardown(self, item):
+    # recorded in the JUnit XML report as test properties
+    timings = self.timings.tests.get(item.nodeid, {})
+    for phase, elapsed in sorted(timings.items()):
+      item.user_properties.append((f'terraform_{phase}', round(elapsed, 3)))
+
+  def pytest_sessionfinish(self, session):
+    if self.worker:
+      self.timings.dump(
+          os.path.join(self.session_dir, f'timings-{self.worker}.json'))
+      return
+    for path in glob.glob(os.path.join(self.session_dir, 'timings-*.json')):
+      self.timings.load(path)
+    report_path = self.config.getoption('plan_timings')
+    if report_path:
+      self.timings.dump(report_path)
+
+  def pytest_terminal_summary(self, terminalreporter):
+    fixtures = sorted(self.timings.fixtures.items(),
+                      key=lambda i: sum(i[1].values()), reverse=True)
+    fixtures = fixtures[:self.config.getoption('plan_timings_top')]
+    if not fixtures:
+      return
+    phases = [
+        p for p in PHASES if any(p in timings for _, timings in fixtures)
+    ]
+    terminalreporter.write_sep('-', 'slowest fixtures')
+    terminalreporter.write_line(''.join(f'{p:>10}' for p in phases) +
+                                '     total  fixture')
+    for fixture, timings in fixtures:
+      terminalreporter.write_line(
+          ''.join(f'{timings.get(p, 0):9.2f}s' for p in phases) +
+          f' {sum(timings.values()):8.2f}s  {fixture}')
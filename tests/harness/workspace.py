@@ -0,0 +1,194 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Shared Terraform initialization of fixture directories."
+
+import collections
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from . import batch
+from . import pool
+from . import timing
+
+LOCK_FILE = '.terraform.lock.hcl'
+VAR_FILE = 'tftest.tfvars'
+# files Terraform writes in the root module, which are never shared
+PRIVATE_FILES = ('.terraform', LOCK_FILE, 'terraform.tfstate',
+                 'terraform.tfstate.backup', '.terraform.tfstate.lock.info')
+
+
+def overlay(fixture_path, tfdir):
+  'Populate tfdir with links to the contents of fixture_path.'
+  # only top-level entries are linked, so that the cost does not depend on
+  # the size of the fixture and data folders are never copied, while files
+  # written by Terraform land in tfdir without touching the fixture
+  fixture_path = os.path.abspath(fixture_path)
+  for entry in os.scandir(fixture_path):
+    if entry.name in PRIVATE_FILES:
+      continue
+    os.symlink(entry.path, os.path.join(tfdir, entry.name),
+               target_is_directory=entry.is_dir())
+
+
+class InitCache(object):
+  'Initialize each fixture once per session and share its .terraform folder.'
+
+  def __init__(self, basedir, binary='terraform', plugin_cache_dir=None,
+               plugin_dir=None, pool=None, timings=None, env=None):
+    self.basedir = basedir
+    self.binary = binary
+    self.plugin_dir = plugin_dir
+    self.pool = pool
+    self.timings = timings or timing.Timings()
+    self.env = dict(env or {})
+    self.init_lock = None
+    if plugin_cache_dir:
+      os.makedirs(plugin_cache_dir, exist_ok=True)
+      self.env['TF_PLUGIN_CACHE_DIR'] = str(plugin_cache_dir)
+      # the plugin cache is not safe for concurrent use, so inits are
+      # serialized across workers and sessions sharing it
+      self.init_lock = str(plugin_cache_dir).rstrip(os.sep) + '.lock'
+    self._dirs = {}
+    self._lock = threading.Lock()
+
+  def terraform(self, tfdir, fixture_path=None):
+    'Return a TerraformTest instance for tfdir using the shared environment.'
+    fixture = os.path.relpath(fixture_path or tfdir, self.basedir)
+    return timing.TimedTerraformTest(tfdir, self.basedir, self.binary,
+                                     env=self.env, timings=self.timings,
+                                     fixture=fixture)
+
+  @contextlib.contextmanager
+  def _slot(self):
+    'Context manager holding the init lock and a Terraform pool slot, if any.'
+    with contextlib.ExitStack() as stack:
+      if self.init_lock:
+        stack.enter_context(pool.file_lock(self.init_lock))
+      if self.pool:
+        stack.enter_context(self.pool.slot())
+      yield
+
+  def init(self, tf):
+    'Run init on tf without upgrading providers, return init output.'
+    with self._slot():
+      return tf.setup(plugin_dir=self.plugin_dir)
+
+  def prepare(self, fixture_path):
+    'Return the path of a session-wide initialized copy of fixture_path.'
+    fixture_path = os.path.abspath(fixture_path)
+    with self._lock:
+      if fixture_path in self._dirs:
+        return self._dirs[fixture_path]
+      # the initialized copy is a sibling of the fixture so that relative
+      # module paths recorded in .terraform/modules stay valid for test copies
+      init_path = tempfile.mkdtemp(
+          prefix='.{}_init_'.format(os.path.basename(fixture_path)),
+          dir=os.path.dirname(fixture_path))
+      try:
+        overlay(fixture_path, init_path)
+        with self._slot():
+          self.terraform(init_path, fixture_path).init(
+              plugin_dir=self.plugin_dir)
+      except Exception:
+        shutil.rmtree(init_path, ignore_errors=True)
+        raise
+      self._dirs[fixture_path] = init_path
+      return init_path
+
+  def providers(self, fixture_path):
+    'Return a digest of the provider versions selected by init of fixture.'
+    lock_path = os.path.join(self.prepare(fixture_path), LOCK_FILE)
+    try:
+      with open(lock_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+      # fixtures without providers have no lock file
+      return ''
+
+  def link(self, fixture_path, tfdir):
+    'Link the initialized .terraform folder and lock file for fixture_path.'
+    init_path = self.prepare(fixture_path)
+    os.symlink(os.path.join(init_path, '.terraform'),
+               os.path.join(tfdir, '.terraform'))
+    lock_path = os.path.join(init_path, LOCK_FILE)
+    if os.path.exists(lock_path):
+      shutil.copy(lock_path, os.path.join(tfdir, LOCK_FILE))
+
+  def cleanup(self):
+    'Remove all initialized copies.'
+    with self._lock:
+      for init_path in self._dirs.values():
+        shutil.rmtree(init_path, ignore_errors=True)
+      self._dirs = {}
+
+
+class WarmWorkspaces(object):
+  'Working directories reused by successive plans of the same fixture.'
+
+  def __init__(self, init_cache):
+    self.init_cache = init_cache
+    self._idle = collections.defaultdict(list)
+    self._dirs = []
+    self._lock = threading.Lock()
+
+  def _create(self, fixture_path):
+    'Return a new working directory linked to the initialized fixture.'
+    tfdir = tempfile.mkdtemp(
+        prefix='.{}_warm_'.format(os.path.basename(fixture_path)),
+        dir=os.path.dirname(fixture_path))
+    with self._lock:
+      self._dirs.append(tfdir)
+    fixture = os.path.relpath(fixture_path, self.init_cache.basedir)
+    with self.init_cache.timings.phase('workspace', fixture):
+      overlay(fixture_path, tfdir)
+    self.init_cache.link(fixture_path, tfdir)
+    return tfdir
+
+  @contextlib.contextmanager
+  def checkout(self, fixture_path):
+    'Yield a working directory for fixture_path, reserved until exit.'
+    fixture_path = os.path.abspath(fixture_path)
+    with self._lock:
+      idle = self._idle[fixture_path]
+      tfdir = idle.pop() if idle else None
+    if tfdir is None:
+      tfdir = self._create(fixture_path)
+    try:
+      yield tfdir
+    finally:
+      with self._lock:
+        self._idle[fixture_path].append(tfdir)
+
+  def var_file(self, fixture_path, tfdir, tf_vars):
+    'Write tf_vars to the variables file in tfdir, return its name or None.'
+    path = os.path.join(tfdir, VAR_FILE)
+    if not tf_vars:
+      if os.path.exists(path):
+        os.unlink(path)
+      return None
+    batch.render_tfvars(fixture_path, path, tf_vars)
+    return VAR_FILE
+
+  def cleanup(self):
+    'Remove all working directories.'
+    with self._lock:
+      for tfdir in self._dirs:
+        shutil.rmtree(tfdir, ignore_errors=True)
+      self._dirs = []
+      self._idle.clear()
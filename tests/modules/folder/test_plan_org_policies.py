@@ -30,7 +30,7 @@ def test_sink(plan_runner):
     for policy in ('boolean_policy', 'restore_policy'):
       value = resource['values'][policy]
       if value:
-        policy_values.append((resource['index'], policy,) + value[0].popitem())
+        policy_values.append((resource['index'], policy,) + next(iter(value[0].items())))
   assert sorted(policy_values) == [
       ('policy-a', 'boolean_policy', 'enforced', True),
       ('policy-b', 'boolean_policy', 'enforced', False),
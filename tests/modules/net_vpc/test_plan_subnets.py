@@ -30,8 +30,7 @@ def test_subnet_factory(plan_runner):
   "Test subnet factory."
   _, resources = plan_runner(data_folder=_VAR_DATA_FOLDER)
   assert len(resources) == 5
-  subnets = [r['values']
-             for r in resources if r['type'] == 'google_compute_subnetwork']
+  subnets = [r['values'] for r in resources.by_type('google_compute_subnetwork')]
   assert {s['name'] for s in subnets} == {'factory-subnet', 'factory-subnet2'}
   assert {len(s['secondary_ip_range']) for s in subnets} == {0, 1}
 
@@ -40,8 +39,7 @@ def test_subnets_simple(plan_runner):
   "Test subnets variable."
   _, resources = plan_runner(subnets=_VAR_SUBNETS)
   assert len(resources) == 4
-  subnets = [r['values']
-             for r in resources if r['type'] == 'google_compute_subnetwork']
+  subnets = [r['values'] for r in resources.by_type('google_compute_subnetwork')]
   assert {s['name'] for s in subnets} == {'a', 'b', 'c'}
   assert {len(s['secondary_ip_range']) for s in subnets} == {0, 0, 2}
 
@@ -60,9 +58,7 @@ def test_subnet_log_configs(plan_runner):
                              subnet_flow_logs=subnet_flow_logs)
   assert len(resources) == 4
   flow_logs = {}
-  for r in resources:
-    if r['type'] != 'google_compute_subnetwork':
-      continue
+  for r in resources.by_type('google_compute_subnetwork'):
     flow_logs[r['values']['name']] = [{key: config[key] for key in config.keys()
                                        & {'aggregation_interval', 'flow_sampling', 'metadata'}}
                                       for config in r['values']['log_config']]
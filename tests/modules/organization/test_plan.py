@@ -76,7 +76,7 @@ def test_policy_boolean(plan_runner):
     for policy in ('boolean_policy', 'restore_policy'):
       value = resource['values'][policy]
       if value:
-        policies.append((policy,) + value[0].popitem())
+        policies.append((policy,) + next(iter(value[0].items())))
   assert set(policies) == set([
       ('boolean_policy', 'enforced', True),
       ('boolean_policy', 'enforced', False),
@@ -14,24 +14,25 @@
 
 def test_prefix(plan_runner):
   "Test project id prefix."
-  _, resources = plan_runner()
+  (_, resources), (_, prefixed) = plan_runner.many([{}, {'prefix': 'foo'}])
   assert len(resources) == 1
   assert resources[0]['values']['name'] == 'my-project'
-  _, resources = plan_runner(prefix='foo')
-  assert len(resources) == 1
-  assert resources[0]['values']['name'] == 'foo-my-project'
+  assert len(prefixed) == 1
+  assert prefixed[0]['values']['name'] == 'foo-my-project'
 
 
 def test_parent(plan_runner):
   "Test project parent."
-  _, resources = plan_runner(parent='folders/12345678')
-  assert len(resources) == 1
-  assert resources[0]['values']['folder_id'] == '12345678'
-  assert resources[0]['values'].get('org_id') == None
-  _, resources = plan_runner(parent='organizations/12345678')
-  assert len(resources) == 1
-  assert resources[0]['values']['org_id'] == '12345678'
-  assert resources[0]['values'].get('folder_id') == None
+  (_, folder_resources), (_, org_resources) = plan_runner.many([
+      {'parent': 'folders/12345678'},
+      {'parent': 'organizations/12345678'},
+  ])
+  assert len(folder_resources) == 1
+  assert folder_resources[0]['values']['folder_id'] == '12345678'
+  assert folder_resources[0]['values'].get('org_id') == None
+  assert len(org_resources) == 1
+  assert org_resources[0]['values']['org_id'] == '12345678'
+  assert org_resources[0]['values'].get('folder_id') == None
 
 
 def test_no_parent(plan_runner):
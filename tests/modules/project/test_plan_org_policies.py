@@ -27,7 +27,7 @@ def test_policy_boolean(plan_runner):
     for policy in ('boolean_policy', 'restore_policy'):
       value = resource['values'][policy]
       if value:
-        policy_values.append((policy,) + value[0].popitem())
+        policy_values.append((policy,) + next(iter(value[0].items())))
   assert sorted(policy_values) == [
       ('boolean_policy', 'enforced', False),
       ('boolean_policy', 'enforced', True),
@@ -0,0 +1,145 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test anchor checks, and external link checks against a local HTTP server."
+
+import collections
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                 'tools'))
+check_links = pytest.importorskip('check_links')
+
+
+# HEAD and GET response status for each path, others are not found
+ROUTES = {'/ok': (200, 200), '/no-head': (405, 200), '/slow': (200, 200)}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+  "Serves ROUTES, recording requests and the peak of concurrent ones."
+
+  def _respond(self, index):
+    server = self.server
+    path = self.path.split('?')[0]
+    with server.lock:
+      server.requests[(self.command, path)] += 1
+      server.active += 1
+      server.max_active = max(server.max_active, server.active)
+    if path == '/slow':
+      time.sleep(0.2)
+    with server.lock:
+      server.active -= 1
+    self.send_response(ROUTES.get(path, (404, 404))[index])
+    self.send_header('Content-Length', '0')
+    self.end_headers()
+
+  def do_HEAD(self):
+    self._respond(0)
+
+  def do_GET(self):
+    self._respond(1)
+
+  def log_message(self, *args):
+    pass
+
+
+@pytest.fixture
+def server():
+  "Runs a local HTTP server, returns it and its base URL."
+  pytest.importorskip('requests')
+  httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+  httpd.lock = threading.Lock()
+  httpd.requests = collections.Counter()
+  httpd.active = httpd.max_active = 0
+  thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+  thread.start()
+  yield httpd, f'http://127.0.0.1:{httpd.server_port}'
+  httpd.shutdown()
+  httpd.server_close()
+
+
+def test_check_urls(server):
+  "Test deduplication and fallback from HEAD to GET requests."
+  httpd, base = server
+  urls = [f'{base}/ok', f'{base}/ok', f'{base}/no-head', f'{base}/missing']
+  result = check_links.check_urls(urls, jobs=4, timeout=5)
+  assert result == {
+      f'{base}/ok': True,
+      f'{base}/no-head': True,
+      f'{base}/missing': False
+  }
+  assert httpd.requests[('HEAD', '/ok')] == 1
+  assert httpd.requests[('GET', '/ok')] == 0
+  assert httpd.requests[('GET', '/no-head')] == 1
+
+
+def test_per_host_limit(server):
+  "Test that concurrent requests to a host are limited."
+  httpd, base = server
+  urls = [f'{base}/slow?{i}' for i in range(8)]
+  result = check_links.check_urls(urls, jobs=8, per_host=2, timeout=5)
+  assert all(result.values())
+  assert httpd.max_active == 2
+
+
+def test_cache(server, tmp_path):
+  "Test that only valid links are cached, until they expire."
+  httpd, base = server
+  path = str(tmp_path / 'links.json')
+  urls = [f'{base}/ok', f'{base}/missing']
+  check_links.check_urls(urls, cache=check_links.LinkCache(path, 60))
+  result = check_links.check_urls(urls, cache=check_links.LinkCache(path, 60))
+  assert result == {f'{base}/ok': True, f'{base}/missing': False}
+  assert httpd.requests[('HEAD', '/ok')] == 1
+  assert httpd.requests[('HEAD', '/missing')] == 2
+  check_links.check_urls(urls, cache=check_links.LinkCache(path, 0))
+  assert httpd.requests[('HEAD', '/ok')] == 2
+
+
+def test_anchors(tmp_path):
+  "Test heading, HTML and line anchors of local link destinations."
+  (tmp_path / 'main.tf').write_text('a\nb\nc\n')
+  (tmp_path / 'other.md').write_text(
+      '# Title\n\n## Foo `bar`: baz!\n\n## Foo bar: baz\n\n'
+      'Setext\n------\n\n<a name="custom"></a>\n')
+  readme = tmp_path / 'README.md'
+  readme.write_text('# Top\n')
+  index = check_links.DocIndex([readme, tmp_path / 'other.md'], processes=1)
+  assert index.get_anchors(tmp_path / 'other.md') == {
+      'title', 'foo-bar-baz', 'foo-bar-baz-1', 'setext', 'custom'
+  }
+  valid = {
+      '#top': True,
+      '#missing': False,
+      'other.md': True,
+      'other.md#foo-bar-baz-1': True,
+      'other.md#Setext': True,
+      'other.md#foo-bar-baz-2': False,
+      './#top': True,
+      'main.tf#L3': True,
+      'main.tf#L1-L3': True,
+      'main.tf#L4': False,
+      'main.tf#other': True,
+      'missing.md#top': False,
+  }
+  for dest, expected in valid.items():
+    assert check_links.check_link(dest, readme, False, index).valid == expected
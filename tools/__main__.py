@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''Run the tools in this folder as commands of a single entry point.
+
+Tools are only imported when their command runs, so that dependencies used by
+other tools are never loaded, and their compiled code is cached between runs.
+
+  python -m tools tfdoc modules/net-vpc
+
+The `--each` flag runs a command once for each of many paths in the same
+process, which is useful in hooks receiving lists of changed files. Options
+before `--` are passed to every run, and file paths are replaced by their
+folder for tools working on folders, e.g.
+
+  python -m tools --each tfdoc --no-replace -- modules/gcs/variables.tf
+'''
+
+import importlib
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+# command: (module, whether the tool takes folders as arguments)
+COMMANDS = {
+    'check-boilerplate': ('check_boilerplate', True),
+    'check-documentation': ('check_documentation', True),
+    'check-links': ('check_links', True),
+    'check-names': ('check_names', True),
+    'state-iam': ('state_iam', False),
+    'tfdoc': ('tfdoc', True),
+    'validate-schema': ('validate_schema', False),
+}
+PROG = 'python -m tools'
+
+
+def usage():
+  'Return the usage message listing available commands.'
+  commands = '\n'.join(f'  {c}' for c in COMMANDS)
+  return (f'Usage: {PROG} [--each] COMMAND [ARGS]...\n\n'
+          f'{__doc__.splitlines()[0]}\n\nCommands:\n{commands}')
+
+
+def run(name, args, standalone=True):
+  'Run a command with args, raise SystemExit on errors.'
+  module = importlib.import_module(COMMANDS[name][0])
+  if not hasattr(module.main, 'main'):
+    # tools not using click take a list of folders
+    if not args:
+      raise SystemExit('No directory to check.')
+    return module.main(args)
+  return module.main.main(args=args, prog_name=f'{PROG} {name}',
+                          standalone_mode=standalone)
+
+
+def run_each(name, args):
+  'Run a command once for each path in args, return the number of errors.'
+  options, paths = [], args
+  if '--' in args:
+    index = args.index('--')
+    options, paths = args[:index], args[index + 1:]
+  if COMMANDS[name][1]:
+    paths = [
+        os.path.dirname(p) or '.' if os.path.isfile(p) else p for p in paths
+    ]
+  errors = 0
+  for path in dict.fromkeys(paths):
+    try:
+      run(name, options + [path], standalone=False)
+    except SystemExit as e:
+      if e.code not in (None, 0):
+        print(e.code if isinstance(e.code, str) else f'{path}: failed',
+              file=sys.stderr)
+        errors += 1
+    except Exception as e:
+      # click usage errors are only handled in standalone mode
+      if not hasattr(e, 'show'):
+        raise
+      e.show()
+      errors += 1
+  return errors
+
+
+def main(argv):
+  each = argv[:1] == ['--each']
+  if each:
+    argv = argv[1:]
+  if not argv or argv[0] in ('-h', '--help'):
+    print(usage())
+    return
+  name = argv[0].replace('_', '-')
+  if name not in COMMANDS:
+    raise SystemExit(f'Unknown command {argv[0]}.\n\n{usage()}')
+  # tools import each other as top-level modules
+  sys.path.insert(0, TOOLS_DIR)
+  if each:
+    errors = run_each(name, argv[1:])
+    if errors:
+      raise SystemExit(f'Errors found in {errors} runs.')
+    return
+  run(name, argv[1:])
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -23,6 +23,7 @@ main use is in CI pipelines triggered by pull requests.
 
 import difflib
 import enum
+import functools
 import pathlib
 
 import click
@@ -33,54 +34,82 @@ BASEDIR = pathlib.Path(__file__).resolve().parents[1]
 State = enum.Enum('State', 'OK FAIL SKIP')
 
 
-def _check_dir(dir_name, exclude_files=None, files=False, show_extra=False):
-  'Invoke tfdoc on folder, using the relevant options.'
-  dir_path = BASEDIR / dir_name
-  for readme_path in sorted(dir_path.glob('**/README.md')):
-    if '.terraform' in str(readme_path):
-      continue
-    diff = None
-    readme = readme_path.read_text()
-    mod_name = str(readme_path.relative_to(dir_path).parent)
-    result = tfdoc.get_doc(readme)
-    if not result:
+def _check_module(readme_path, dir_path, exclude_files=None, files=False,
+                  show_extra=False, cache=None):
+  'Invoke tfdoc on a module README, return its name, state and diff.'
+  diff = None
+  readme = readme_path.read_text()
+  mod_name = str(readme_path.relative_to(dir_path).parent)
+  result = tfdoc.get_doc(readme)
+  if not result:
+    state = State.SKIP
+  else:
+    try:
+      new_doc = tfdoc.create_doc(readme_path.parent, files, show_extra,
+                                 exclude_files, readme, cache)
+    except SystemExit:
       state = State.SKIP
     else:
-      try:
-        new_doc = tfdoc.create_doc(readme_path.parent, files, show_extra,
-                                   exclude_files, readme)
-      except SystemExit:
-        state = state.SKIP
+      if new_doc == result['doc']:
+        state = State.OK
       else:
-        if new_doc == result['doc']:
-          state = State.OK
-        else:
-          state = State.FAIL
-          header = f'----- {mod_name} diff -----\n'
-          ndiff = difflib.ndiff(result['doc'].split('\n'), new_doc.split('\n'))
-          diff = '\n'.join([header] + list(ndiff))
-    yield mod_name, state, diff
+        state = State.FAIL
+        header = f'----- {mod_name} diff -----\n'
+        ndiff = difflib.ndiff(result['doc'].split('\n'), new_doc.split('\n'))
+        diff = '\n'.join([header] + list(ndiff))
+  return mod_name, state, diff
+
+
+def _check_dirs(dir_names, exclude_files=None, files=False, show_extra=False,
+                jobs=None, cache=None):
+  'Invoke tfdoc on folders using one process pool, yield results in order.'
+  readmes = []
+  for dir_name in dir_names:
+    dir_path = BASEDIR / dir_name
+    for readme_path in sorted(dir_path.glob('**/README.md')):
+      if '.terraform' in str(readme_path):
+        continue
+      readmes.append((dir_name, readme_path, dir_path))
+  fn = functools.partial(_check_readme, exclude_files=exclude_files,
+                         files=files, show_extra=show_extra, cache=cache)
+  for (dir_name, _, _), result in zip(readmes,
+                                      tfdoc.pool_map(fn, readmes, jobs)):
+    yield (dir_name,) + result
+
+
+def _check_readme(item, **kw):
+  'Unpack a readme item built by _check_dirs and check its module.'
+  _, readme_path, dir_path = item
+  return _check_module(readme_path, dir_path, **kw)
 
 
 @click.command()
 @click.argument('dirs', type=str, nargs=-1)
+@click.option('--cache/--no-cache', default=True,
+              help='Reuse parsed files from the tfdoc cache.')
 @click.option('--exclude-file', '-x', multiple=True)
 @click.option('--files/--no-files', default=False)
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of processes, defaults to CPUs.')
 @click.option('--show-diffs/--no-show-diffs', default=False)
 @click.option('--show-extra/--no-show-extra', default=False)
-def main(dirs, exclude_file=None, files=False, show_diffs=False,
-         show_extra=False):
+def main(dirs, cache=True, exclude_file=None, files=False, jobs=None,
+         show_diffs=False, show_extra=False):
   'Cycle through modules and ensure READMEs are up-to-date.'
   print(f'files: {files}, extra: {show_extra}, diffs: {show_diffs}\n')
   errors = []
   state_labels = {State.FAIL: '✗', State.OK: '✓', State.SKIP: '?'}
-  for dir_name in dirs:
-    print(f'----- {dir_name} -----')
-    for mod_name, state, diff in _check_dir(dir_name, exclude_file, files,
-                                            show_extra):
-      if state == State.FAIL:
-        errors.append((mod_name, diff))
-      print(f'[{state_labels[state]}] {mod_name}')
+  last_dir = None
+  # modules in all folders are checked by a single pool of processes
+  cache = tfdoc.ParseCache() if cache else None
+  for dir_name, mod_name, state, diff in _check_dirs(dirs, exclude_file, files,
+                                                     show_extra, jobs, cache):
+    if dir_name != last_dir:
+      print(f'----- {dir_name} -----')
+      last_dir = dir_name
+    if state == State.FAIL:
+      errors.append((mod_name, diff))
+    print(f'[{state_labels[state]}] {mod_name}')
   if errors:
     if show_diffs:
       print('Errored diffs:')
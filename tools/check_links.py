@@ -17,59 +17,256 @@
 
 This tool recursively checks that local links in Markdown files point to valid
 destinations. Its main use is in CI pipelines triggered by pull requests.
+
+Markdown files are parsed in parallel before links are checked, so that
+anchors of local destinations are known: heading anchors generated by GitHub
+for Markdown files, and line anchors for other files.
+
+External links are checked when the `--external` flag is set. Each URL is only
+checked once across all documents, by a pool of threads limiting concurrent
+requests to the same host, and URLs found valid are cached for some time in
+a local file so that later runs skip them.
 '''
 
 import collections
+import concurrent.futures
+import json
+import os
 import pathlib
-import requests
+import re
+import tempfile
+import threading
+import time
 import urllib.parse
 
 import click
 import marko
 
 BASEDIR = pathlib.Path(__file__).resolve().parents[1]
+CACHE_FILE = BASEDIR / '.check-links-cache.json'
 DOC = collections.namedtuple('DOC', 'path relpath links')
 LINK = collections.namedtuple('LINK', 'dest valid')
+HTML_ANCHOR_RE = re.compile(r'<a\s[^>]*\b(?:name|id)\s*=\s*["\']([^"\']+)["\']',
+                            re.I)
+# line anchors of files rendered as code, like those linked by tfdoc
+LINE_ANCHOR_RE = re.compile(r'L(\d+)(?:-L(\d+))?$')
+SLUG_RE = re.compile(r'[^\w\- ]')
+
+
+class LinkCache(object):
+  'Cache of valid external links, expiring after ttl seconds.'
+
+  def __init__(self, path, ttl):
+    self.path = path
+    self.ttl = ttl
+    try:
+      with open(path) as f:
+        self.checked = json.load(f)
+    except (IOError, OSError, ValueError):
+      self.checked = {}
+
+  def get(self, url):
+    'Return True if url was found valid within ttl.'
+    return time.time() - self.checked.get(url, 0) < self.ttl
+
+  def set(self, url, valid):
+    'Record the result of a check, only valid links are cached.'
+    if valid:
+      self.checked[url] = time.time()
+    else:
+      self.checked.pop(url, None)
+
+  def save(self):
+    'Write unexpired entries to the cache file via a temporary file.'
+    now = time.time()
+    checked = {k: v for k, v in self.checked.items() if now - v < self.ttl}
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+    with os.fdopen(fd, 'w') as f:
+      json.dump(checked, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.path)
+
+
+class LinkChecker(object):
+  'Check external links with a session and a concurrency limit per host.'
+
+  def __init__(self, per_host=4, timeout=10):
+    # imported here as it is slow to import and only used for external links
+    import requests
+    import requests.adapters
+    self.requests = requests
+    self.per_host = per_host
+    self.timeout = timeout
+    self.hosts = {}
+    self.lock = threading.Lock()
+
+  def _host(self, url):
+    'Return the session and semaphore for the host of url.'
+    host = urllib.parse.urlparse(url).netloc
+    with self.lock:
+      if host not in self.hosts:
+        session = self.requests.Session()
+        adapter = self.requests.adapters.HTTPAdapter(pool_connections=1,
+                                                     pool_maxsize=self.per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.hosts[host] = (session, threading.BoundedSemaphore(self.per_host))
+      return self.hosts[host]
+
+  def check(self, url):
+    'Return True if url is reachable, trying HEAD before GET.'
+    session, semaphore = self._host(url)
+    with semaphore:
+      try:
+        response = session.head(url, timeout=self.timeout, allow_redirects=True)
+        # some servers reject HEAD requests for valid resources
+        if not response.ok:
+          response = session.get(url, timeout=self.timeout, stream=True)
+          response.close()
+        return response.ok
+      except self.requests.exceptions.RequestException:
+        return False
+
+
+def check_urls(urls, jobs=16, per_host=4, timeout=10, cache=None):
+  'Check external urls once each, return a dict of url validity.'
+  result = {}
+  pending = []
+  for url in sorted(set(urls)):
+    if cache and cache.get(url):
+      result[url] = True
+    else:
+      pending.append(url)
+  if pending:
+    checker = LinkChecker(per_host, timeout)
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+      result.update(zip(pending, executor.map(checker.check, pending)))
+  if cache:
+    for url in pending:
+      cache.set(url, result[url])
+    cache.save()
+  return result
+
 
+def _text(element):
+  'Return the plain text of an inline Markdown element.'
+  if isinstance(element, (marko.inline.Image, marko.inline.InlineHTML)):
+    return ''
+  if isinstance(element.children, str):
+    return element.children
+  return ''.join(_text(e) for e in element.children)
 
-def check_link(link, readme_path, external):
-  'Checks if a link element has a valid destination.'
-  link_valid = None
-  url = urllib.parse.urlparse(link.dest)
+
+def slugify(text):
+  'Return the anchor GitHub generates for a heading with text.'
+  return SLUG_RE.sub('', text.strip().lower()).replace(' ', '-')
+
+
+def parse_doc(readme_path):
+  'Return link destinations and anchors of a Markdown file.'
+  text = readme_path.read_text()
+  root = marko.parser.Parser().parse(text)
+  links = []
+  anchors = set(HTML_ANCHOR_RE.findall(text))
+  slugs = collections.Counter()
+  # depth first in document order, as duplicate headings are numbered
+  elements = [root]
+  while elements:
+    el = elements.pop()
+    if isinstance(el, marko.inline.Link):
+      links.append(el.dest)
+    elif isinstance(el, (marko.block.Heading, marko.block.SetextHeading)):
+      slug = slugify(_text(el))
+      anchors.add(f'{slug}-{slugs[slug]}' if slugs[slug] else slug)
+      slugs[slug] += 1
+    if isinstance(getattr(el, 'children', None), list):
+      elements.extend(reversed(el.children))
+  return links, anchors
+
+
+def find_docs(dir_name):
+  'Return paths of Markdown files in dir_name.'
+  return [
+      p for p in sorted((BASEDIR / dir_name).glob('**/*.md'))
+      if '.terraform' not in str(p) and '.pytest' not in str(p)
+  ]
+
+
+class DocIndex(object):
+  'Links and anchors of Markdown files, line counts of other files.'
+
+  def __init__(self, paths, processes=None):
+    paths = [_normpath(p) for p in paths]
+    if len(paths) > 1 and (processes or os.cpu_count()) > 1:
+      with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        parsed = list(executor.map(parse_doc, paths, chunksize=8))
+    else:
+      parsed = [parse_doc(p) for p in paths]
+    self.links = {p: links for p, (links, _) in zip(paths, parsed)}
+    self.anchors = {p: anchors for p, (_, anchors) in zip(paths, parsed)}
+
+  def get_links(self, path):
+    'Return link destinations of a Markdown file.'
+    path = _normpath(path)
+    if path not in self.links:
+      self.links[path], self.anchors[path] = parse_doc(path)
+    return self.links[path]
+
+  def get_anchors(self, path):
+    'Return anchors of a Markdown file or folder, the line count of others.'
+    path = _normpath(path)
+    if path not in self.anchors:
+      if path.is_dir():
+        # folders are rendered with their README
+        readme = path / 'README.md'
+        anchors = self.get_anchors(readme) if readme.exists() else set()
+        self.anchors[path] = anchors
+      elif path.suffix == '.md':
+        self.links[path], self.anchors[path] = parse_doc(path)
+      else:
+        with path.open('rb') as f:
+          self.anchors[path] = sum(1 for _ in f)
+    return self.anchors[path]
+
+  def valid(self, path, fragment):
+    'Return True if fragment is an anchor of the file at path.'
+    anchors = self.get_anchors(path)
+    if isinstance(anchors, int):
+      # other anchors of files rendered as code are not checked
+      match = LINE_ANCHOR_RE.match(fragment)
+      return not match or all(
+          0 < int(n) <= anchors for n in match.groups() if n)
+    return fragment in anchors or fragment.lower() in anchors
+
+
+def _normpath(path):
+  'Return path without redundant separators and up-level references.'
+  return pathlib.Path(os.path.normpath(path))
+
+
+def check_link(dest, readme_path, external, index):
+  'Checks if a link destination and its anchor, if any, are valid.'
+  url = urllib.parse.urlparse(dest)
   # If the link is public, say the link is anyway valid
-  # if --external is not set; check the link otherwise
+  # if --external is not set; it is checked later otherwise
   if url.scheme:
-    link_valid = True
-    if external:
-      try:
-        response = requests.get(link.dest)
-        link_valid = response.ok
-      except requests.exceptions.RequestException:
-        link_valid = False
+    return LINK(dest, None if external else True)
   # The link is private
-  else:
-    link_valid = (readme_path.parent / url.path).exists()
-  return LINK(link.dest, link_valid)
+  path = readme_path.parent / url.path if url.path else readme_path
+  if not path.exists():
+    return LINK(dest, False)
+  if not url.fragment:
+    return LINK(dest, True)
+  return LINK(dest, index.valid(path, urllib.parse.unquote(url.fragment)))
 
 
-def check_docs(dir_name, external=False):
-  'Traverses dir_name and checks for all Markdown files.'
+def check_docs(dir_name, index, external=False):
+  'Checks links in the Markdown files of dir_name.'
   dir_path = BASEDIR / dir_name
-  parser = marko.parser.Parser()
-  for readme_path in sorted(dir_path.glob('**/*.md')):
-    if '.terraform' in str(readme_path) or '.pytest' in str(readme_path):
-      continue
-
-    root = parser.parse(readme_path.read_text())
-    elements = collections.deque([root])
-    links = []
-    while elements:
-      el = elements.popleft()
-      if isinstance(el, marko.inline.Link):
-        links.append(check_link(el, readme_path, external))
-      elif hasattr(el, 'children'):
-        elements.extend(el.children)
-
+  for readme_path in find_docs(dir_name):
+    links = [
+        check_link(dest, readme_path, external, index)
+        for dest in index.get_links(readme_path)
+    ]
     yield DOC(readme_path, str(readme_path.relative_to(dir_path)), links)
 
 
@@ -77,12 +274,46 @@ def check_docs(dir_name, external=False):
 @click.argument('dirs', type=str, nargs=-1)
 @click.option('-e', '--external', is_flag=True, default=False,
               help='Whether to test external links.')
-def main(dirs, external):
+@click.option('--cache/--no-cache', default=True,
+              help='Skip external links found valid within --cache-ttl.')
+@click.option('--cache-ttl', type=float, default=24,
+              help='Hours after which valid external links are checked again.')
+@click.option('--jobs', '-j', type=int, default=16,
+              help='Number of threads checking external links.')
+@click.option('--per-host', type=int, default=4,
+              help='Maximum concurrent requests to the same host.')
+@click.option('--timeout', type=float, default=10,
+              help='Seconds to wait for each external request.')
+@click.option('--processes', type=int, default=None,
+              help='Number of processes parsing Markdown files.')
+def main(dirs, external, cache=True, cache_ttl=24, jobs=16, per_host=4,
+         timeout=10, processes=None):
   'Checks links in Markdown files contained in dirs.'
+  # all files are parsed first, so that anchors of link targets are known
+  index = DocIndex(
+      sorted(set(p for dir_name in dirs for p in find_docs(dir_name))),
+      processes)
+  docs = {
+      dir_name: list(check_docs(dir_name, index, external)) for dir_name in dirs
+  }
+  if external:
+    # external links are checked once for all documents
+    urls = []
+    for dir_docs in docs.values():
+      urls += [l.dest for doc in dir_docs for l in doc.links if l.valid is None]
+    cache = LinkCache(CACHE_FILE, cache_ttl * 3600) if cache else None
+    valid = check_urls(urls, jobs, per_host, timeout, cache)
+    for dir_docs in docs.values():
+      for i, doc in enumerate(dir_docs):
+        links = [
+            LINK(l.dest, valid[l.dest]) if l.valid is None else l
+            for l in doc.links
+        ]
+        dir_docs[i] = doc._replace(links=links)
   errors = []
   for dir_name in dirs:
     print(f'----- {dir_name} -----')
-    for doc in check_docs(dir_name, external):
+    for doc in docs[dir_name]:
       state = '✓' if all(l.valid for l in doc.links) else '✗'
       print(f'[{state}] {doc.relpath} ({len(doc.links)})')
       if state == '✗':
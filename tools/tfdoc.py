@@ -39,10 +39,20 @@ the tags in the `MARK_BEGIN` and `MARK_END` constants, and setting the
 
 import collections
 import enum
+import fnmatch
+import functools
 import glob
+import hashlib
+import importlib.util
+import json
 import os
+import queue
 import re
+import shutil
+import sqlite3
 import string
+import tempfile
+import time
 import urllib.parse
 
 import click
@@ -51,6 +61,11 @@ __version__ = '2.1.0'
 
 # TODO(ludomagno): decide if we want to support variables*.tf and outputs*.tf
 
+BASEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('TFDOC_CACHE_DIR',
+                           os.path.join(BASEDIR, '.tfdoc-cache'))
+# bump when parsing changes, so that stale entries are never used
+CACHE_VERSION = '1'
 FILE_DESC_DEFAULTS = {
     'main.tf': 'Module-level locals and resources.',
     'outputs.tf': 'Module outputs.',
@@ -58,46 +73,36 @@ FILE_DESC_DEFAULTS = {
     'variables.tf': 'Module variables.',
     'versions.tf': 'Version pins.',
 }
-FILE_RE_MODULES = re.compile(
-    r'(?sm)module\s*"[^"]+"\s*\{[^\}]*?source\s*=\s*"([^"]+)"')
-FILE_RE_RESOURCES = re.compile(r'(?sm)resource\s*"([^"]+)"')
+FILE_RE_MODULES = re.compile(r'module\s*"[^"]+"\s*\{')
+FILE_RE_MODULE_SOURCE = re.compile(r'source\s*=\s*"([^"]+)"')
+FILE_RE_RESOURCES = re.compile(r'resource\s*"([^"]+)"')
+FILE_RE_RESOURCE_OPEN = re.compile(r'resource\s*"([^"]*)$')
 HEREDOC_RE = re.compile(r'(?sm)^<<\-?END(\s*.*?)\s*END$')
+LINE_RE_ATTR = re.compile(r'([a-z]+)\s*=\s*"?(.*?)"?\s*$')
+LINE_RE_ATTR_EMPTY = re.compile(r'[a-z]+\s*=\s*$')
+LINE_RE_CLOSE = re.compile(r'\s?\}\s*$')
+LINE_RE_OPEN = {
+    'output': re.compile(r'output\s*"([^"]+)"\s*\{\s*$'),
+    'variable': re.compile(r'variable\s*"([^"]+)"\s*\{\s*$'),
+}
+LINE_RE_VALIDATION = re.compile(r'validation\s*\{\s*$')
+LINE_RE_VALUE = re.compile(r'"?(.*?)"?\s*$')
 MARK_BEGIN = '<!-- BEGIN TFDOC -->'
 MARK_END = '<!-- END TFDOC -->'
 MARK_OPTS_RE = re.compile(r'(?sm)<!-- TFDOC OPTS ((?:[a-z_]+:[0-1]\s*?)+) -->')
 OUT_ENUM = enum.Enum('O', 'OPEN ATTR ATTR_DATA CLOSE COMMENT TXT SKIP')
-OUT_RE = re.compile(r'''(?smx)
-    # output open
-    (?:^\s*output\s*"([^"]+)"\s*\{\s*$) |
-    # attribute
-    (?:^\n?\s{2}([a-z]+)\s*=\s*"?(.*?)"?\s*$) |
-    # output close
-    (?:^\s?(\})\s*$) |
-    # comment
-    (?:^\s*\#\s*(.*?)\s*$) |
-    # anything else
-    (?:^(.*?)$)
-''')
 OUT_TEMPLATE = ('description', 'value', 'sensitive')
-TAG_RE = re.compile(r'(?sm)^\s*#\stfdoc:([^:]+:\S+)\s+(.*?)\s*$')
+TAG_RE = re.compile(r'\s*#\stfdoc:([^:]+:\S+)\s+(.*?)\s*$')
+TAG_RE_KEY = re.compile(r'\s*#\stfdoc:([^:]+:\S+)\s*$')
 UNESCAPED = string.digits + string.ascii_letters + ' .,;:_-'
 VAR_ENUM = enum.Enum('V', 'OPEN ATTR ATTR_DATA SKIP CLOSE COMMENT TXT')
-VAR_RE = re.compile(r'''(?smx)
-    # variable open
-    (?:^\s*variable\s*"([^"]+)"\s*\{\s*$) |
-    # attribute
-    (?:^\s{2}([a-z]+)\s*=\s*"?(.*?)"?\s*$) |
-    # validation
-    (?:^\s+validation\s*(\{)\s*$) |
-    # variable close
-    (?:^\s?(\})\s*$) |
-    # comment
-    (?:^\s*\#\s*(.*?)\s*$) |
-    # anything else
-    (?:^(.*?)$)
-''')
 VAR_RE_TYPE = re.compile(r'([\(\{\}\)])')
 VAR_TEMPLATE = ('default', 'description', 'type', 'nullable')
+# token enum and item template for each block type
+BLOCKS = {
+    'output': (OUT_ENUM, OUT_TEMPLATE),
+    'variable': (VAR_ENUM, VAR_TEMPLATE),
+}
 
 File = collections.namedtuple('File', 'name description modules resources')
 Output = collections.namedtuple(
@@ -105,26 +110,163 @@ Output = collections.namedtuple(
 Variable = collections.namedtuple(
     'Variable',
     'name description type default required nullable source file line')
+Scan = collections.namedtuple('Scan', 'tags modules resources tokens')
 
 # parsing functions
 
 
-def _extract_tags(body):
-  'Extract and return tfdocs tags from content.'
-  return {k: v for k, v in TAG_RE.findall(body)}
-
-
-def _parse(body, enum=VAR_ENUM, re=VAR_RE, template=VAR_TEMPLATE):
+def _resume(lines, text, k):
+  'Return where scanning resumes after a token ending on line k.'
+  if k == len(lines):
+    return k
+  # trailing whitespace in tokens extends over the blank lines after them
+  k = text[k + 1] - 1
+  return k if not lines[k] else k + 1
+
+
+def _attribute(lines, text, i, newline=False):
+  'Return name, data and line index of an attribute starting at line i.'
+  line = lines[i]
+  if newline and not line and i + 1 < len(lines):
+    attribute = _attribute(lines, text, i + 1)
+    if attribute:
+      return attribute
+  if len(line) >= 2:
+    if not line[:2].isspace():
+      return None
+    y, rest = i, line[2:]
+  else:
+    # two whitespace characters precede the name, blank lines included
+    window = '\n'.join(lines[i:i + 3])
+    if not window[:2].isspace():
+      return None
+    y = i + window.count('\n', 0, 2)
+    rest = window[2:].split('\n', 1)[0]
+  m = LINE_RE_ATTR.match(rest)
+  if not m:
+    return None
+  if not m.group(2) and LINE_RE_ATTR_EMPTY.match(rest):
+    # an empty value is taken from the next line of text, if any
+    y = text[y + 1]
+    if y == len(lines):
+      return m.group(1), '', y
+    return m.group(1), LINE_RE_VALUE.match(lines[y].lstrip()).group(1), y
+  return m.group(1), m.group(2), y
+
+
+def _block_token(lines, text, block, i, allow_empty):
+  'Return the block token at line i, the line and state to resume from.'
+  enum = BLOCKS[block][0]
+  j = text[i]
+  stripped = lines[j].lstrip() if j < len(lines) else ''
+  m = stripped.startswith(block) and LINE_RE_OPEN[block].match(stripped)
+  if m:
+    leading = 0
+    while not lines[i + leading]:
+      leading += 1
+    return (enum.OPEN, m.group(1), None,
+            i + leading + 1), _resume(lines, text, j), True
+  attribute = _attribute(lines, text, i, block == 'output')
+  if attribute:
+    key, data, k = attribute
+    return (enum.ATTR_DATA, data, key, None), _resume(lines, text, k), True
+  if (block == 'variable' and stripped.startswith('validation') and
+      (j > i or stripped != lines[j]) and LINE_RE_VALIDATION.match(stripped)):
+    return (enum.SKIP, '{', None, None), _resume(lines, text, j), True
+  if LINE_RE_CLOSE.match(lines[i]):
+    return (enum.CLOSE, '}', None, None), _resume(lines, text, i), True
+  if (not lines[i] and i + 1 < len(lines) and
+      LINE_RE_CLOSE.match(lines[i + 1]) and lines[i + 1][0] == '}'):
+    return (enum.CLOSE, '}', None, None), _resume(lines, text, i + 1), True
+  if stripped.startswith('#'):
+    data, k = stripped[1:].strip(), j
+    if not data and text[j + 1] < len(lines):
+      # an empty comment swallows the next line of text
+      k = text[j + 1]
+      data = lines[k].strip()
+    return (enum.COMMENT, data, None, None), _resume(lines, text, k), True
+  if lines[i]:
+    return (enum.TXT, lines[i], None, None), i + 1, True
+  if allow_empty:
+    return (enum.TXT, '', None, None), i, False
+  if i + 1 == len(lines):
+    return None, i + 1, True
+  data = '\n' + lines[i + 1]
+  return (enum.TXT, data, None, None), i + 1 if not data[1:] else i + 2, True
+
+
+def _scan_resources(line, resources):
+  'Append resource types in line, return an unterminated one if present.'
+  resources += FILE_RE_RESOURCES.findall(line)
+  m = FILE_RE_RESOURCE_OPEN.search(line)
+  return m.group(1) if m else None
+
+
+def _scan(body, block=None):
+  'Scan body once for tags, modules, resources and optionally block tokens.'
+  lines = body.split('\n')
+  # index of the first non blank line at or after each line, for blocks
+  text = [len(lines)] * (len(lines) + 1)
+  for i in range(len(lines) - 1 if block else -1, -1, -1):
+    text[i] = i if lines[i].strip() else text[i + 1]
+  tags, modules, resources, tokens = {}, [], [], []
+  module, resource, tag = False, None, None
+  cursor, allow_empty = 0, True
+  for i, line in enumerate(lines):
+    if tag and line.strip():
+      tags[tag], tag = line.strip(), None
+    elif 'tfdoc:' in line:
+      m = TAG_RE_KEY.match(line)
+      if m:
+        # a tag without a value takes it from the next line of text
+        tag = m.group(1)
+        if i + 1 < len(lines) or line[-1:].isspace():
+          tags[tag] = ''
+      else:
+        m = TAG_RE.match(line)
+        if m:
+          tags[m.group(1)] = m.group(2)
+    if resource is not None:
+      # resource types, like in the original expression, can span lines
+      close = line.find('"')
+      if close == -1:
+        resource += '\n' + line
+      else:
+        resources.append(resource + '\n' + line[:close])
+        resource = _scan_resources(line[close + 1:], resources)
+    elif 'resource' in line:
+      resource = _scan_resources(line, resources)
+    pos = 0
+    while module or 'module' in line:
+      if not module:
+        m = FILE_RE_MODULES.search(line, pos)
+        if not m:
+          break
+        module, pos = True, m.end()
+        continue
+      # the source of a module block is only taken before any closing brace
+      close = line.find('}', pos)
+      m = FILE_RE_MODULE_SOURCE.search(line, pos)
+      if m and (close == -1 or m.start() < close):
+        modules.append(m.group(1))
+        module, pos = False, m.end()
+      elif close != -1:
+        module, pos = False, close + 1
+      else:
+        break
+    while block and cursor == i:
+      token, cursor, allow_empty = _block_token(lines, text, block, cursor,
+                                                allow_empty)
+      if token:
+        tokens.append(token)
+  return Scan(tags, modules, resources, tokens)
+
+
+def _parse(tokens, enum=VAR_ENUM, template=VAR_TEMPLATE):
   'Low-level parsing function for outputs and variables.'
   item = context = None
-  for m in re.finditer(body):
-    token = enum(m.lastindex)
-    data = m.group(m.lastindex)
+  for token, data, key, line in tokens:
     if token == enum.OPEN:
-      match = m.group(0)
-      leading_lines = len(match) - len(match.lstrip("\n"))
-      start = m.span()[0]
-      line = body[:start].count('\n') + leading_lines + 1
       item = {'name': data, 'tags': {}, 'line': line}
       item.update({k: [] for k in template})
       context = None
@@ -135,7 +277,7 @@ def _parse(body, enum=VAR_ENUM, re=VAR_RE, template=VAR_TEMPLATE):
     elif token == enum.ATTR_DATA:
       if not item:
         continue
-      context = m.group(m.lastindex - 1)
+      context = key
       item[context].append(data)
     elif token == enum.SKIP:
       context = token
@@ -148,7 +290,120 @@ def _parse(body, enum=VAR_ENUM, re=VAR_RE, template=VAR_TEMPLATE):
         item[context].append(data)
 
 
-def parse_files(basepath, exclude_files=None):
+def _parse_file(shortname, body):
+  'Return a File named tuple for the body of a Terraform file.'
+  scan = _scan(body)
+  description = scan.tags.get('file:description',
+                              FILE_DESC_DEFAULTS.get(shortname))
+  modules = set(
+      os.path.basename(urllib.parse.urlparse(m).path) for m in scan.modules)
+  return File(shortname, description, modules, set(scan.resources))
+
+
+def _parse_outputs(shortname, body):
+  'Return a list of Output named tuples for the body of an outputs file.'
+  result = []
+  tokens = _scan(body, 'output').tokens
+  for item in _parse(tokens, *BLOCKS['output']):
+    description = ''.join(item['description'])
+    sensitive = item['sensitive'] != []
+    consumers = item['tags'].get('output:consumers', '')
+    result.append(
+        Output(name=item['name'], description=description, sensitive=sensitive,
+               consumers=consumers, file=shortname, line=item['line']))
+  return result
+
+
+def _parse_variables(shortname, body):
+  'Return a list of Variable named tuples for the body of a variables file.'
+  result = []
+  for item in _parse(_scan(body, 'variable').tokens):
+    description = (''.join(item['description'])).replace('|', '\\|')
+    vtype = '\n'.join(item['type'])
+    default = HEREDOC_RE.sub(r'\1', '\n'.join(item['default']))
+    required = not item['default']
+    nullable = item.get('nullable') != ['false']
+    source = item['tags'].get('variable:source', '')
+    if not required and default != 'null' and vtype == 'string':
+      default = f'"{default}"'
+    result.append(
+        Variable(name=item['name'], description=description, type=vtype,
+                 default=default, required=required, source=source,
+                 file=shortname, line=item['line'], nullable=nullable))
+  return result
+
+
+class ParseCache(object):
+  'Persistent cache of parsed files keyed on path, size, mtime and content.'
+
+  def __init__(self, path=None):
+    self.path = path or os.path.join(CACHE_DIR, f'parse-{CACHE_VERSION}.db')
+    self._db = None
+
+  def __getstate__(self):
+    # connections are not shared with the processes of a pool
+    return {'path': self.path, '_db': None}
+
+  @property
+  def db(self):
+    'Return the database connection, creating the database if needed.'
+    if self._db is None:
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+      self._db = sqlite3.connect(self.path, timeout=30)
+      self._db.execute('PRAGMA journal_mode=WAL')
+      self._db.execute(
+          'CREATE TABLE IF NOT EXISTS entries (path TEXT, kind TEXT, '
+          'mtime INTEGER, size INTEGER, digest TEXT, data TEXT, '
+          'PRIMARY KEY (path, kind))')
+    return self._db
+
+  def get(self, path, kind, stat):
+    'Return cached data for path if unchanged, its content and digest.'
+    row = self.db.execute(
+        'SELECT mtime, size, digest, data FROM entries '
+        'WHERE path = ? AND kind = ?', (path, kind)).fetchone()
+    if row and tuple(row[:2]) == (stat.st_mtime_ns, stat.st_size):
+      return json.loads(row[3]), None, None
+    with open(path, 'rb') as file:
+      content = file.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if row and row[2] == digest:
+      # touched but unchanged, only refresh the stat fields
+      self.set(path, kind, stat, digest, row[3])
+      return json.loads(row[3]), content, digest
+    return None, content, digest
+
+  def set(self, path, kind, stat, digest, data):
+    'Store data for path, serialized as JSON unless already a string.'
+    if not isinstance(data, str):
+      data = json.dumps(data)
+    with self.db:
+      self.db.execute(
+          'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+          (path, kind, stat.st_mtime_ns, stat.st_size, digest, data))
+
+
+def _read_parsed(name, kind, parse, cache=None):
+  'Return data parsed from a file, via cache if set.'
+  if cache is None:
+    with open(name) as file:
+      return parse(file.read())
+  path = os.path.abspath(name)
+  stat = os.stat(path)
+  data, content, digest = cache.get(path, kind, stat)
+  if data is None:
+    data = parse(content.decode())
+    cache.set(path, kind, stat, digest, data)
+  return data
+
+
+def _file_data(shortname, body):
+  'Return a File named tuple as JSON serializable data.'
+  name, description, modules, resources = _parse_file(shortname, body)
+  return [name, description, sorted(modules), sorted(resources)]
+
+
+def parse_files(basepath, exclude_files=None, cache=None):
   'Return a list of File named tuples in root module at basepath.'
   exclude_files = exclude_files or []
   for name in glob.glob(os.path.join(basepath, '*tf')):
@@ -158,21 +413,15 @@ def parse_files(basepath, exclude_files=None):
     if shortname in exclude_files:
       continue
     try:
-      with open(name) as file:
-        body = file.read()
+      data = _read_parsed(name, 'file',
+                          functools.partial(_file_data, shortname), cache)
     except (IOError, OSError) as e:
       raise SystemExit(f'Cannot read file {name}: {e}')
-    tags = _extract_tags(body)
-    description = tags.get('file:description',
-                           FILE_DESC_DEFAULTS.get(shortname))
-    modules = set(
-        os.path.basename(urllib.parse.urlparse(m).path)
-        for m in FILE_RE_MODULES.findall(body))
-    resources = set(FILE_RE_RESOURCES.findall(body))
-    yield File(shortname, description, modules, resources)
+    name, description, modules, resources = data
+    yield File(name, description, set(modules), set(resources))
 
 
-def parse_outputs(basepath, exclude_files=None):
+def parse_outputs(basepath, exclude_files=None, cache=None):
   'Return a list of Output named tuples for root module outputs*.tf.'
   exclude_files = exclude_files or []
   for name in glob.glob(os.path.join(basepath, 'outputs*tf')):
@@ -180,20 +429,15 @@ def parse_outputs(basepath, exclude_files=None):
     if shortname in exclude_files:
       continue
     try:
-      with open(name) as file:
-        body = file.read()
+      data = _read_parsed(name, 'outputs',
+                          functools.partial(_parse_outputs, shortname), cache)
     except (IOError, OSError) as e:
       raise SystemExit(f'Cannot open outputs file {shortname}.')
-    for item in _parse(body, enum=OUT_ENUM, re=OUT_RE, template=OUT_TEMPLATE):
-      description = ''.join(item['description'])
-      sensitive = item['sensitive'] != []
-      consumers = item['tags'].get('output:consumers', '')
-      yield Output(name=item['name'], description=description,
-                   sensitive=sensitive, consumers=consumers, file=shortname,
-                   line=item['line'])
+    for item in data:
+      yield Output(*item)
 
 
-def parse_variables(basepath, exclude_files=None):
+def parse_variables(basepath, exclude_files=None, cache=None):
   'Return a list of Variable named tuples for root module variables*.tf.'
   exclude_files = exclude_files or []
   for name in glob.glob(os.path.join(basepath, 'variables*tf')):
@@ -201,23 +445,12 @@ def parse_variables(basepath, exclude_files=None):
     if shortname in exclude_files:
       continue
     try:
-      with open(name) as file:
-        body = file.read()
+      data = _read_parsed(name, 'variables',
+                          functools.partial(_parse_variables, shortname), cache)
     except (IOError, OSError) as e:
       raise SystemExit(f'Cannot open variables file {shortname}.')
-    for item in _parse(body):
-      description = (''.join(item['description'])).replace('|', '\\|')
-      vtype = '\n'.join(item['type'])
-      default = HEREDOC_RE.sub(r'\1', '\n'.join(item['default']))
-      required = not item['default']
-      nullable = item.get('nullable') != ['false']
-      source = item['tags'].get('variable:source', '')
-      if not required and default != 'null' and vtype == 'string':
-        default = f'"{default}"'
-
-      yield Variable(name=item['name'], description=description, type=vtype,
-                     default=default, required=required, source=source,
-                     file=shortname, line=item['line'], nullable=nullable)
+    for item in data:
+      yield Variable(*item)
 
 
 # formatting functions
@@ -346,19 +579,80 @@ def get_doc_opts(readme):
 
 
 def create_doc(module_path, files=False, show_extra=False, exclude_files=None,
-               readme=None):
+               readme=None, cache=None):
+  files, show_extra = _doc_options(readme, files, show_extra)
+  try:
+    mod_files = list(parse_files(module_path, exclude_files,
+                                 cache)) if files else []
+    mod_variables = list(parse_variables(module_path, exclude_files, cache))
+    mod_outputs = list(parse_outputs(module_path, exclude_files, cache))
+  except (IOError, OSError) as e:
+    raise SystemExit(e)
+  return format_doc(mod_outputs, mod_variables, mod_files, show_extra)
+
+
+def _doc_options(readme, files=False, show_extra=False):
+  'Return files and show_extra options, with overrides from readme if set.'
   if readme:
     # check for overrides in doc
     opts = get_doc_opts(readme)
     files = opts.get('files', files)
     show_extra = opts.get('show_extra', show_extra)
+  return files, show_extra
+
+
+def module_data(module_path, exclude_files=None, cache=None):
+  'Return files, variables and outputs of a module as JSON serializable data.'
   try:
-    mod_files = list(parse_files(module_path, exclude_files)) if files else []
-    mod_variables = list(parse_variables(module_path, exclude_files))
-    mod_outputs = list(parse_outputs(module_path, exclude_files))
+    mod_files = sorted(parse_files(module_path, exclude_files, cache))
+    mod_variables = sorted(parse_variables(module_path, exclude_files, cache))
+    mod_outputs = sorted(parse_outputs(module_path, exclude_files, cache))
   except (IOError, OSError) as e:
     raise SystemExit(e)
-  return format_doc(mod_outputs, mod_variables, mod_files, show_extra)
+  return {
+      'files': [
+          dict(f._asdict(), modules=sorted(f.modules),
+               resources=sorted(f.resources)) for f in mod_files
+      ],
+      'modules': sorted(set().union(*[f.modules for f in mod_files])),
+      'outputs': [o._asdict() for o in mod_outputs],
+      'resources': sorted(set().union(*[f.resources for f in mod_files])),
+      'variables': [v._asdict() for v in mod_variables],
+  }
+
+
+def catalog_data(paths, exclude_files=None, jobs=None, cache=None):
+  'Return data for all modules under paths, parsed by a pool of processes.'
+  module_paths = [m for p in paths for m in find_modules(p, readme=False)]
+  fn = functools.partial(module_data, exclude_files=exclude_files, cache=cache)
+  return {
+      'version': __version__,
+      'modules': dict(zip(module_paths, pool_map(fn, module_paths, jobs))),
+  }
+
+
+def find_modules(path, readme=True):
+  'Return sorted paths of folders under path with a README or .tf files.'
+  result = []
+  for dirpath, dirnames, filenames in os.walk(path):
+    dirnames[:] = [d for d in dirnames if d != '.terraform']
+    if readme and 'README.md' in filenames:
+      result.append(dirpath)
+    elif not readme and any(f.endswith('.tf') for f in filenames):
+      result.append(dirpath)
+  return sorted(result)
+
+
+def pool_map(fn, items, jobs=None):
+  'Map fn over items using a process pool, yielding results in order.'
+  items = list(items)
+  if jobs == 1 or len(items) < 2:
+    yield from map(fn, items)
+    return
+  # imported here as it is slow to import and only used by some commands
+  import concurrent.futures
+  with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+    yield from executor.map(fn, items)
 
 
 def get_readme(readme_path):
@@ -369,43 +663,335 @@ def get_readme(readme_path):
     raise SystemExit(f'Error opening README {readme_path}: {e}')
 
 
+def _write_atomic(path, content):
+  'Write content to path via a temporary file renamed over it.'
+  dirname, basename = os.path.split(path)
+  fd, tmp_path = tempfile.mkstemp(prefix=f'.{basename}.', dir=dirname or '.')
+  try:
+    with os.fdopen(fd, 'w') as f:
+      f.write(content)
+    shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
+  except BaseException:
+    # an interrupted write leaves the original file untouched
+    os.unlink(tmp_path)
+    raise
+
+
 def replace_doc(readme_path, doc, readme=None):
-  'Replace document in module\'s README.md file.'
+  'Replace document in module\'s README.md file, return True if changed.'
   readme = readme or get_readme(readme_path)
   result = get_doc(readme)
   if not result:
     raise SystemExit(f'Mark not found in README {readme_path}')
   if doc == result['doc']:
-    return
+    return False
+  content = '\n'.join([
+      readme[:result['start']].rstrip(),
+      MARK_BEGIN,
+      doc,
+      MARK_END,
+      readme[result['end']:].lstrip(),
+  ])
+  if content == readme:
+    return False
   try:
-    open(readme_path, 'w').write('\n'.join([
-        readme[:result['start']].rstrip(),
-        MARK_BEGIN,
-        doc,
-        MARK_END,
-        readme[result['end']:].lstrip(),
-    ]))
+    _write_atomic(readme_path, content)
   except (IOError, OSError) as e:
     raise SystemExit(f'Error replacing README {readme_path}: {e}')
+  return True
+
+
+def _module_doc(module_path, files=False, show_extra=False, exclude_files=None,
+                replace=True, cache=None):
+  'Create and optionally replace doc for a module, return path, doc and state.'
+  readme_path = os.path.join(module_path, 'README.md')
+  readme = get_readme(readme_path)
+  # modules found in recursive mode without marks are skipped
+  if not get_doc(readme):
+    return module_path, None, False
+  doc = create_doc(module_path, files, show_extra, exclude_files, readme, cache)
+  replaced = replace and replace_doc(readme_path, doc, readme)
+  return module_path, doc, replaced
+
+
+def _watched(path):
+  'Return True for Terraform and README files outside .terraform folders.'
+  name = os.path.basename(path)
+  if f'{os.sep}.terraform{os.sep}' in path or name.startswith('.'):
+    return False
+  return name == 'README.md' or fnmatch.fnmatch(name, '*tf')
+
+
+def _snapshot(dirs):
+  'Return size and modification time of watched files under dirs.'
+  result = {}
+  for path in dirs:
+    for dirpath, dirnames, filenames in os.walk(path):
+      dirnames[:] = [d for d in dirnames if d != '.terraform']
+      for name in filenames:
+        name = os.path.join(dirpath, name)
+        if _watched(name):
+          try:
+            stat = os.stat(name)
+          except OSError:
+            continue
+          result[name] = (stat.st_mtime_ns, stat.st_size)
+  return result
+
+
+def _poll_changes(dirs, interval):
+  'Yield sets of changed paths under dirs, found by periodic scans.'
+  previous = _snapshot(dirs)
+  while True:
+    time.sleep(interval)
+    current = _snapshot(dirs)
+    changed = {
+        p for p in previous.keys() | current.keys()
+        if previous.get(p) != current.get(p)
+    }
+    previous = current
+    if changed:
+      yield changed
+
+
+def _event_changes(dirs, interval):
+  'Yield sets of changed paths under dirs, from filesystem events.'
+  from watchdog import events as watchdog_events
+  from watchdog import observers as watchdog_observers
+  changes = queue.Queue()
+
+  class Handler(watchdog_events.FileSystemEventHandler):
+
+    def on_any_event(self, event):
+      for path in (event.src_path, getattr(event, 'dest_path', None)):
+        if path and _watched(path):
+          changes.put(path)
+
+  observer = watchdog_observers.Observer()
+  for path in dirs:
+    observer.schedule(Handler(), path, recursive=True)
+  observer.start()
+  try:
+    while True:
+      changed = {changes.get()}
+      # editors often save in several steps, coalesce their events
+      time.sleep(interval)
+      while not changes.empty():
+        changed.add(changes.get())
+      yield changed
+  finally:
+    observer.stop()
+    observer.join()
+
+
+class Watcher(object):
+  'Keep parsed modules in memory and refresh their README on changes.'
+
+  def __init__(self, files=False, show_extra=False, exclude_files=None):
+    self.files = files
+    self.show_extra = show_extra
+    self.exclude_files = exclude_files or []
+    # module path: {file name: (File or None, variables, outputs)}
+    self.modules = {}
+
+  def _parse(self, path):
+    'Parse a single Terraform file, return None if missing or excluded.'
+    shortname = os.path.basename(path)
+    if shortname in self.exclude_files or not os.path.isfile(path):
+      return None
+    with open(path) as f:
+      body = f.read()
+    file = None if os.path.islink(path) else _parse_file(shortname, body)
+    variables = outputs = []
+    if fnmatch.fnmatch(shortname, 'variables*tf'):
+      variables = _parse_variables(shortname, body)
+    if fnmatch.fnmatch(shortname, 'outputs*tf'):
+      outputs = _parse_outputs(shortname, body)
+    return file, variables, outputs
+
+  def _module(self, module_path):
+    'Return parsed files for a module, parsing all of them the first time.'
+    if module_path not in self.modules:
+      self.modules[module_path] = {}
+      for name in sorted(os.listdir(module_path)):
+        if _watched(name) and name != 'README.md':
+          self.update(os.path.join(module_path, name))
+    return self.modules[module_path]
+
+  def update(self, path):
+    'Parse a changed file again, forgetting it if it was removed.'
+    module_path = os.path.dirname(path)
+    if module_path not in self.modules or not _watched(path):
+      return
+    if os.path.basename(path) == 'README.md':
+      return
+    parsed = self._parse(path)
+    if parsed:
+      self.modules[module_path][os.path.basename(path)] = parsed
+    else:
+      self.modules[module_path].pop(os.path.basename(path), None)
+
+  def refresh(self, module_path):
+    'Replace tables in the module README if changed, return True if replaced.'
+    readme_path = os.path.join(module_path, 'README.md')
+    try:
+      with open(readme_path) as f:
+        readme = f.read()
+    except (IOError, OSError):
+      return False
+    result = get_doc(readme)
+    if not result:
+      return False
+    files, show_extra = _doc_options(readme, self.files, self.show_extra)
+    module = self._module(module_path)
+    parsed = [module[k] for k in sorted(module)]
+    doc = format_doc([o for p in parsed for o in p[2]],
+                     [v for p in parsed for v in p[1]],
+                     [p[0] for p in parsed if p[0]] if files else [],
+                     show_extra)
+    return replace_doc(readme_path, doc, readme)
+
+
+class DefaultGroup(click.Group):
+  'Command group running the doc command when no other command is given.'
+
+  def parse_args(self, ctx, args):
+    if args and args[0] not in self.commands and args[0] != '--help':
+      args.insert(0, 'doc')
+    return super().parse_args(ctx, args)
+
 
+@click.group(cls=DefaultGroup)
+def main():
+  '''Generate README tables for a module, or a JSON catalog of modules.
 
-@click.command()
+  Without a command, arguments are passed to the doc command.
+  '''
+
+
+@main.command()
 @click.argument('module_path', type=click.Path(exists=True))
+@click.option('--cache/--no-cache', default=True,
+              help='Reuse parsed files from the cache in .tfdoc-cache.')
 @click.option('--exclude-file', '-x', multiple=True)
 @click.option('--files/--no-files', default=False)
+@click.option('--format', 'output_format', default='markdown',
+              type=click.Choice(['markdown', 'json']),
+              help='Print module data as JSON instead of Markdown tables.')
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Processes used in recursive mode, defaults to CPUs.')
+@click.option('--recursive/--no-recursive', default=False,
+              help='Process all modules with a README under the path.')
 @click.option('--replace/--no-replace', default=True)
 @click.option('--show-extra/--no-show-extra', default=False)
-def main(module_path=None, exclude_file=None, files=False, replace=True,
-         show_extra=True):
-  'Program entry point.'
+def doc(module_path=None, cache=True, exclude_file=None, files=False,
+        output_format='markdown', jobs=None, recursive=False, replace=True,
+        show_extra=True):
+  'Generate tables for a module and replace them in its README.'
+  cache = ParseCache() if cache else None
+  if output_format == 'json':
+    # JSON output is never written to README files
+    if recursive:
+      data = catalog_data([module_path], exclude_file, jobs, cache)
+    else:
+      data = module_data(module_path, exclude_file, cache)
+    print(json.dumps(data, indent=2))
+    return
+  if recursive:
+    fn = functools.partial(_module_doc, files=files, show_extra=show_extra,
+                           exclude_files=exclude_file, replace=replace,
+                           cache=cache)
+    # docs are computed and only changed files written by the pool
+    total = updated = 0
+    for path, doc, replaced in pool_map(fn, find_modules(module_path), jobs):
+      total += doc is not None
+      updated += replaced
+      if replaced:
+        print(f'updated {path}')
+      elif doc is not None and not replace:
+        print(f'----- {path} -----')
+        print(doc)
+    if replace:
+      print(f'{updated} of {total} README files updated')
+    return
   readme_path = os.path.join(module_path, 'README.md')
   readme = get_readme(readme_path)
-  doc = create_doc(module_path, files, show_extra, exclude_file, readme)
+  doc = create_doc(module_path, files, show_extra, exclude_file, readme, cache)
   if replace:
     replace_doc(readme_path, doc, readme)
   else:
     print(doc)
 
 
+@main.command()
+@click.argument('dirs', type=click.Path(exists=True), nargs=-1, required=True)
+@click.option('--cache/--no-cache', default=True,
+              help='Reuse parsed files from the cache in .tfdoc-cache.')
+@click.option('--exclude-file', '-x', multiple=True)
+@click.option('--jobs', '-j', type=int, default=None,
+              help='Number of processes, defaults to CPUs.')
+@click.option('--output', '-o', type=click.File('w'), default='-',
+              help='Write the catalog to a file instead of standard output.')
+def catalog(dirs, cache=True, exclude_file=None, jobs=None, output=None):
+  'Write a JSON index of all modules with Terraform files under dirs.'
+  cache = ParseCache() if cache else None
+  data = catalog_data(dirs, exclude_file, jobs, cache)
+  json.dump(data, output, indent=2)
+  output.write('\n')
+
+
+@main.command()
+@click.argument('dirs', type=click.Path(exists=True), nargs=-1)
+@click.option('--exclude-file', '-x', multiple=True)
+@click.option('--files/--no-files', default=False)
+@click.option(
+    '--interval', type=float, default=None,
+    help='Seconds between scans (default 0.25), or to wait for '
+    'related events (default 0.05).')
+@click.option(
+    '--polling/--no-polling', default=False,
+    help='Scan folders instead of using watchdog events, changes '
+    'are picked up to one interval after files are saved.')
+@click.option('--show-extra/--no-show-extra', default=False)
+def watch(dirs, exclude_file=None, files=False, interval=None, polling=False,
+          show_extra=False):
+  '''Refresh README tables of modules under dirs when their files change.
+
+  Changes are picked up from watchdog events if the package is installed,
+  otherwise dirs are scanned every interval, adding up to that interval to the
+  time a README takes to refresh.
+  '''
+  dirs = dirs or [
+      os.path.join(BASEDIR, d) for d in ('modules', 'fast/stages', 'examples')
+  ]
+  watcher = Watcher(files, show_extra, exclude_file)
+  # watchdog is an optional dependency
+  if polling or importlib.util.find_spec('watchdog') is None:
+    # scanning the whole tree takes a few milliseconds
+    changes = _poll_changes(dirs, interval or 0.25)
+    print(f'polling {", ".join(dirs)}')
+  else:
+    changes = _event_changes(dirs, interval or 0.05)
+    print(f'watching {", ".join(dirs)}')
+  try:
+    for changed in changes:
+      start = time.perf_counter()
+      module_paths = sorted(set(os.path.dirname(p) for p in changed))
+      for path in changed:
+        watcher.update(path)
+      for module_path in module_paths:
+        try:
+          replaced = watcher.refresh(module_path)
+        except SystemExit as e:
+          print(e)
+          continue
+        if replaced:
+          elapsed = (time.perf_counter() - start) * 1000
+          print(f'updated {module_path} ({elapsed:.0f}ms)')
+  except KeyboardInterrupt:
+    pass
+
+
 if __name__ == '__main__':
   main()